@@ -0,0 +1,551 @@
+# AsyncSession-based versions of the functions in app.crud, awaited by the FastAPI
+# endpoints, the auth dependency and the LangGraph tools (whose schemas come from
+# the app.crud functions of the same name).
+import asyncio
+from typing import AsyncIterator, List
+from datetime import date, datetime
+from sqlalchemy import delete, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql import Select
+from sqlmodel import select, or_
+from app.crud import (
+    _group_count_statement, _status_filter, _student_filters, _student_projection, _trigram_name_search_statement,
+    _rank_rows, _semantic_search_statement, update_returning_statement, students_update_statement,
+    students_delete_statement, student_list_statement, teacher_list_statement, user_list_statement,
+    student_name_index, student_cache, STUDENT_GROUP_COLUMNS, TEACHER_GROUP_COLUMNS, MAX_PAGE_SIZE
+)
+from app.database import async_session
+from app.events import notify_change
+from app.settings import EXPORT_BATCH_SIZE, NAME_SEARCH_THRESHOLD
+from app.models import Student, Teacher, StudentStatus, User, UserRole, RefreshToken, ChatThread
+from app.utils import get_password_hash_async
+from app.vector_index import search_similar
+
+async def add_student(
+    roll_no: str,
+    name: str,
+    date_of_birth: date,
+    class_name: str,
+    section: str,
+    gender: str,
+    cnic_or_bform: str,
+    contact_no: str,
+    email: str,
+    father_guardian_name: str,
+    father_guardian_contact: str,
+    father_guardian_cnic: str,
+    permanent_address: str,
+    religion: str,
+    current_status: str = StudentStatus.ACTIVE
+) -> Student:
+    """
+    Add a new student to the database.
+    """
+    student = Student(
+        roll_no=roll_no,
+        name=name,
+        date_of_birth=date_of_birth,
+        class_name=class_name,
+        section=section,
+        gender=gender,
+        cnic_or_bform=cnic_or_bform,
+        contact_no=contact_no,
+        email=email,
+        father_guardian_name=father_guardian_name,
+        father_guardian_contact=father_guardian_contact,
+        father_guardian_cnic=father_guardian_cnic,
+        permanent_address=permanent_address,
+        religion=religion,
+        current_status=current_status
+    )
+    async with async_session() as session:
+        session.add(student)
+        await session.commit()
+        await session.refresh(student)
+    notify_change("student", "insert", [student.id])
+    return student
+
+async def get_student(student_id: int) -> Student | None:
+    """
+    Get a student by their ID.
+    """
+    student = student_cache.get(student_id)
+    if student is not None:
+        return student
+    generation = student_cache.generation
+    async with async_session() as session:
+        student = await session.get(Student, student_id)
+    if student is not None:
+        student_cache.put(student, generation)
+    return student
+
+async def get_students_by_ids(student_ids: List[int]) -> List[Student]:
+    """
+    Get several students by their IDs, querying only those not cached.
+    """
+    students, missing = student_cache.get_many(student_ids)
+    if not missing:
+        return students
+    generation = student_cache.generation
+    async with async_session() as session:
+        loaded = (await session.exec(select(Student).where(Student.id.in_(missing)))).all()
+    for student in loaded:
+        student_cache.put(student, generation)
+    return students + list(loaded)
+
+async def get_all_students() -> List[Student]:
+    """
+    Get all students from the database.
+    """
+    async with async_session() as session:
+        return (await session.exec(select(Student))).all()
+
+async def search_student_by_roll_no(roll_no: str) -> Student | None:
+    """
+    Search for a student by their roll number.
+    """
+    student = student_cache.get_by_roll_no(roll_no)
+    if student is not None:
+        return student
+    generation = student_cache.generation
+    async with async_session() as session:
+        student = (await session.exec(select(Student).where(Student.roll_no == roll_no))).first()
+    if student is not None:
+        student_cache.put(student, generation)
+    return student
+
+async def search_students_by_class_section(class_name: str, section: str) -> List[Student]:
+    """
+    Search for students by class and section.
+    """
+    async with async_session() as session:
+        statement = select(Student).where(
+            Student.class_name == class_name,
+            Student.section == section
+        )
+        return (await session.exec(statement)).all()
+
+async def search_students_by_status(status: StudentStatus) -> List[Student]:
+    """
+    Search for students by their current status.
+    """
+    async with async_session() as session:
+        return (await session.exec(select(Student).where(_status_filter(status)))).all()
+
+async def count_students(
+    group_by: List[str] | None = None,
+    class_name: str | None = None,
+    section: str | None = None,
+    status: StudentStatus | None = None
+) -> List[dict]:
+    """
+    Count students, optionally per group of class_name, section, current_status and gender.
+    """
+    statement = _group_count_statement(
+        Student, group_by, STUDENT_GROUP_COLUMNS, _student_filters(class_name, section, status)
+    )
+    async with async_session() as session:
+        return [dict(row) for row in (await session.execute(statement)).mappings()]
+
+async def top_student_groups(group_by: List[str], n: int = 5, status: StudentStatus | None = None) -> List[dict]:
+    """
+    Get the n largest groups of students.
+    """
+    statement = _group_count_statement(
+        Student, group_by, STUDENT_GROUP_COLUMNS, _student_filters(None, None, status), limit=n
+    )
+    async with async_session() as session:
+        return [dict(row) for row in (await session.execute(statement)).mappings()]
+
+async def list_students(
+    columns: List[str] | None = None,
+    class_name: str | None = None,
+    section: str | None = None,
+    status: StudentStatus | None = None,
+    after_id: int = 0,
+    limit: int = 50
+) -> List[dict]:
+    """
+    List students page by page, returning only the requested columns.
+    """
+    statement = student_list_statement(columns, class_name, section, status, after_id, limit)
+    async with async_session() as session:
+        return [dict(row) for row in (await session.execute(statement)).mappings()]
+
+async def search_students_by_name(name: str, k: int = 10, columns: List[str] | None = None) -> List[dict]:
+    """
+    Search for students by a partial or misspelled name, best matches first.
+    """
+    k = max(1, min(k, MAX_PAGE_SIZE))
+    async with async_session() as session:
+        if session.bind.dialect.name == "postgresql":
+            await session.execute(
+                text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)"),
+                {"threshold": str(NAME_SEARCH_THRESHOLD)}
+            )
+            statement = _trigram_name_search_statement(name, columns, k)
+            return [dict(row) for row in (await session.execute(statement)).mappings()]
+        # The in-process index may have to (re)load names with the sync engine
+        matches = await asyncio.to_thread(student_name_index.search, name, k)
+        statement = select(*_student_projection(columns)).where(Student.id.in_([student_id for student_id, _ in matches]))
+        return _rank_rows((await session.execute(statement)).mappings(), matches)
+
+async def semantic_search(query: str, entity: str = "teacher", k: int = 5) -> List[dict]:
+    """
+    Find students or teachers matching a free-text description, best matches first.
+    """
+    k = max(1, min(k, MAX_PAGE_SIZE))
+    # Embedding the query and searching the index are CPU-bound
+    matches = await asyncio.to_thread(search_similar, entity, query, k)
+    async with async_session() as session:
+        return _rank_rows((await session.execute(_semantic_search_statement(entity, matches))).mappings(), matches)
+
+async def update_student(
+    student_id: int,
+    roll_no: str | None = None,
+    name: str | None = None,
+    date_of_birth: date | None = None,
+    class_name: str | None = None,
+    section: str | None = None,
+    gender: str | None = None,
+    current_status: str | None = None,
+    cnic_or_bform: str | None = None,
+    contact_no: str | None = None,
+    email: str | None = None,
+    father_guardian_name: str | None = None,
+    father_guardian_contact: str | None = None,
+    father_guardian_cnic: str | None = None,
+    permanent_address: str | None = None,
+    religion: str | None = None
+) -> Student | None:
+    """
+    Update a student's information. Only the provided fields are changed.
+    """
+    values = {
+        "roll_no": roll_no,
+        "name": name,
+        "date_of_birth": date_of_birth,
+        "class_name": class_name,
+        "section": section,
+        "gender": gender,
+        "current_status": current_status,
+        "cnic_or_bform": cnic_or_bform,
+        "contact_no": contact_no,
+        "email": email,
+        "father_guardian_name": father_guardian_name,
+        "father_guardian_contact": father_guardian_contact,
+        "father_guardian_cnic": father_guardian_cnic,
+        "permanent_address": permanent_address,
+        "religion": religion
+    }
+    async with async_session() as session:
+        student = (await session.scalars(update_returning_statement(Student, student_id, values))).one_or_none()
+        await session.commit()
+    if student:
+        notify_change("student", "update", [student.id])
+    return student
+
+async def delete_student(student_id: int) -> bool:
+    """
+    Delete a student from the database.
+    """
+    async with async_session() as session:
+        deleted = (await session.execute(delete(Student).where(Student.id == student_id).returning(Student.id))).first()
+        await session.commit()
+    if deleted:
+        notify_change("student", "delete", [student_id])
+    return deleted is not None
+
+async def update_students_where(
+    values: dict,
+    class_name: str | None = None,
+    section: str | None = None,
+    status: StudentStatus | None = None,
+    student_ids: List[int] | None = None
+) -> List[dict]:
+    """
+    Update every student matching the filters in one statement.
+    """
+    statement = students_update_statement(values, class_name, section, status, student_ids)
+    async with async_session() as session:
+        rows = [dict(row) for row in (await session.execute(statement)).mappings()]
+        await session.commit()
+    if rows:
+        notify_change("student", "update", [row["id"] for row in rows])
+    return rows
+
+async def delete_students_where(
+    class_name: str | None = None,
+    section: str | None = None,
+    status: StudentStatus | None = None,
+    student_ids: List[int] | None = None
+) -> List[dict]:
+    """
+    Delete every student matching the filters in one statement.
+    """
+    statement = students_delete_statement(class_name, section, status, student_ids)
+    async with async_session() as session:
+        rows = [dict(row) for row in (await session.execute(statement)).mappings()]
+        await session.commit()
+    if rows:
+        notify_change("student", "delete", [row["id"] for row in rows])
+    return rows
+
+async def add_teacher(name: str, email: str, phone: str, department: str, subject: str) -> Teacher:
+    """
+    Add a new teacher to the database.
+    """
+    teacher = Teacher(name=name, email=email, phone=phone, department=department, subject=subject)
+    async with async_session() as session:
+        session.add(teacher)
+        await session.commit()
+        await session.refresh(teacher)
+    notify_change("teacher", "insert", [teacher.id])
+    return teacher
+
+async def get_teacher(teacher_id: int) -> Teacher | None:
+    """
+    Get a teacher from the database by ID.
+    """
+    async with async_session() as session:
+        return await session.get(Teacher, teacher_id)
+
+async def get_teachers_by_ids(teacher_ids: List[int]) -> List[Teacher]:
+    """
+    Get several teachers by their IDs in a single query.
+    """
+    async with async_session() as session:
+        return (await session.exec(select(Teacher).where(Teacher.id.in_(teacher_ids)))).all()
+
+async def get_all_teachers() -> list[Teacher]:
+    """
+    Get all teachers from the database.
+    """
+    async with async_session() as session:
+        return (await session.exec(select(Teacher))).all()
+
+async def list_teachers(
+    columns: List[str] | None = None,
+    department: str | None = None,
+    subject: str | None = None,
+    after_id: int = 0,
+    limit: int = 50
+) -> List[dict]:
+    """
+    List teachers page by page, returning only the requested columns.
+    """
+    statement = teacher_list_statement(columns, department, subject, after_id, limit)
+    async with async_session() as session:
+        return [dict(row) for row in (await session.execute(statement)).mappings()]
+
+async def count_teachers(group_by: List[str] | None = None) -> List[dict]:
+    """
+    Count teachers, optionally per department and/or subject.
+    """
+    statement = _group_count_statement(Teacher, group_by, TEACHER_GROUP_COLUMNS, [])
+    async with async_session() as session:
+        return [dict(row) for row in (await session.execute(statement)).mappings()]
+
+async def update_teacher(teacher_id: int, name: str | None = None, email: str | None = None,
+                         phone: str | None = None, department: str | None = None,
+                         subject: str | None = None) -> Teacher | None:
+    """
+    Update a teacher's information in the database.
+    """
+    values = {"name": name, "email": email, "phone": phone, "department": department, "subject": subject}
+    async with async_session() as session:
+        teacher = (await session.scalars(update_returning_statement(Teacher, teacher_id, values))).one_or_none()
+        await session.commit()
+    if teacher:
+        notify_change("teacher", "update", [teacher.id])
+    return teacher
+
+async def delete_teacher(teacher_id: int) -> bool:
+    """
+    Delete a teacher from the database.
+    """
+    async with async_session() as session:
+        deleted = (await session.execute(delete(Teacher).where(Teacher.id == teacher_id).returning(Teacher.id))).first()
+        await session.commit()
+    if deleted:
+        notify_change("teacher", "delete", [teacher_id])
+    return deleted is not None
+
+async def add_admin(username: str, email: str, password: str) -> User:
+    """
+    Add a new admin to the database.
+    """
+    return await create_user(User(
+        username=username,
+        email=email,
+        hashed_password=await get_password_hash_async(password),
+        role=UserRole.ADMIN
+    ))
+
+async def create_user(user: User) -> User:
+    """
+    Insert a new user into the database.
+    """
+    async with async_session() as session:
+        session.add(user)
+        await session.commit()
+        await session.refresh(user)
+    return user
+
+async def get_user_by_username(username: str) -> User | None:
+    """
+    Get a user by their username.
+    """
+    async with async_session() as session:
+        return (await session.exec(select(User).where(User.username == username))).first()
+
+async def get_user_by_email(email: str) -> User | None:
+    """
+    Get a user by their email address.
+    """
+    async with async_session() as session:
+        return (await session.exec(select(User).where(User.email == email))).first()
+
+async def get_user_by_username_or_email(username: str, email: str) -> User | None:
+    """
+    Get a user whose username or email matches either value.
+    """
+    async with async_session() as session:
+        statement = select(User).where(or_(User.username == username, User.email == email))
+        return (await session.exec(statement)).first()
+
+async def update_user(user_id: int, role: UserRole | None = None, is_active: bool | None = None) -> User | None:
+    """
+    Update a user's role and/or active flag.
+    """
+    async with async_session() as session:
+        user = await session.get(User, user_id)
+        if user:
+            if role is not None:
+                user.role = role
+            if is_active is not None:
+                user.is_active = is_active
+            await session.commit()
+            await session.refresh(user)
+        return user
+
+async def update_user_password(user_id: int, hashed_password: str) -> None:
+    """
+    Replace a user's stored password hash.
+    """
+    async with async_session() as session:
+        user = await session.get(User, user_id)
+        if user:
+            user.hashed_password = hashed_password
+            await session.commit()
+
+async def get_all_users() -> List[User]:
+    """
+    Get all users from the database.
+    """
+    async with async_session() as session:
+        return (await session.exec(select(User))).all()
+
+async def list_users(
+    role: UserRole | None = None,
+    is_active: bool | None = None,
+    after_id: int = 0,
+    limit: int = 50
+) -> List[dict]:
+    """
+    List users page by page, without their password hashes.
+    """
+    statement = user_list_statement(role, is_active, after_id, limit)
+    async with async_session() as session:
+        return [dict(row) for row in (await session.execute(statement)).mappings()]
+
+async def stream_rows(statement: Select, batch_size: int = EXPORT_BATCH_SIZE) -> AsyncIterator[dict]:
+    """
+    Yield the rows of a query as dicts, fetching them from a server-side
+    cursor batch_size at a time.
+    """
+    async with async_session() as session:
+        result = await session.stream(statement.execution_options(yield_per=batch_size))
+        async for row in result.mappings():
+            yield dict(row)
+
+async def create_refresh_token(user_id: int, token_hash: str, expires_at: datetime) -> RefreshToken:
+    """
+    Store the hash of a newly issued refresh token.
+    """
+    async with async_session() as session:
+        refresh_token = RefreshToken(user_id=user_id, token_hash=token_hash, expires_at=expires_at)
+        session.add(refresh_token)
+        await session.commit()
+        await session.refresh(refresh_token)
+    return refresh_token
+
+async def rotate_refresh_token(token_hash: str, new_token_hash: str, expires_at: datetime) -> User | None:
+    """
+    Exchange a refresh token for a new one in a single transaction.
+
+    Presenting a token that was already rotated or revoked is treated as token
+    theft: every outstanding refresh token of that user is revoked.
+
+    Returns:
+        User | None: The token's user if the token was valid, None otherwise
+    """
+    now = datetime.utcnow()
+    async with async_session() as session:
+        statement = select(RefreshToken).where(RefreshToken.token_hash == token_hash).with_for_update()
+        stored = (await session.exec(statement)).first()
+        if stored is None:
+            return None
+        if stored.revoked_at is not None:
+            await session.execute(
+                update(RefreshToken)
+                .where(RefreshToken.user_id == stored.user_id, RefreshToken.revoked_at.is_(None))
+                .values(revoked_at=now)
+            )
+            await session.commit()
+            return None
+        if stored.expires_at <= now:
+            return None
+        user = await session.get(User, stored.user_id)
+        if user is None or not user.is_active:
+            return None
+
+        replacement = RefreshToken(user_id=user.id, token_hash=new_token_hash, expires_at=expires_at)
+        session.add(replacement)
+        await session.flush()
+        stored.revoked_at = now
+        stored.replaced_by_id = replacement.id
+        await session.commit()
+        return user
+
+async def revoke_refresh_token(token_hash: str) -> bool:
+    """
+    Revoke a refresh token.
+
+    Returns:
+        bool: True if an active token was revoked, False otherwise
+    """
+    async with async_session() as session:
+        result = await session.execute(
+            update(RefreshToken)
+            .where(RefreshToken.token_hash == token_hash, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=datetime.utcnow())
+        )
+        await session.commit()
+        return result.rowcount > 0
+
+async def touch_chat_thread(thread_id: str, user_id: int) -> None:
+    """
+    Record that a chat thread was just used, creating its record if needed.
+    """
+    async with async_session() as session:
+        thread = await session.get(ChatThread, thread_id)
+        if thread is None:
+            session.add(ChatThread(thread_id=thread_id, user_id=user_id))
+        else:
+            thread.last_active_at = datetime.utcnow()
+        try:
+            await session.commit()
+        except IntegrityError:
+            # Another request created the record first, which is just as good
+            await session.rollback()
@@ -1,15 +1,22 @@
+import hashlib
+import secrets
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlmodel import Session, select
 from authlib.integrations.starlette_client import OAuth
 from starlette.config import Config
-from app.database import engine
+from app.async_crud import (
+    get_user_by_username, get_user_by_email, create_user,
+    create_refresh_token, rotate_refresh_token
+)
+from app.cache import TTLCache
 from app.models import User, UserRole
-from app.settings import SECRET_KEY
+from app.settings import (
+    SECRET_KEY, USER_CACHE_MAXSIZE, USER_CACHE_TTL_SECONDS, REFRESH_TOKEN_EXPIRE_DAYS
+)
+from app.utils import get_password_hash_async, verify_and_update_password_async
 
 # Load environment variables
 config = Config(".env")
@@ -19,17 +26,16 @@ oauth = OAuth(config)
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify password against hashed password."""
-    return pwd_context.verify(plain_password, hashed_password)
+# Resolved users by username, so authenticated requests skip the user lookup.
+# The cache is per process: invalidate_user only clears this worker's entry and
+# other workers pick up the change when their entry expires.
+user_cache = TTLCache(maxsize=USER_CACHE_MAXSIZE, ttl=USER_CACHE_TTL_SECONDS)
 
-def get_password_hash(password: str) -> str:
-    """Generate password hash."""
-    return pwd_context.hash(password)
+def invalidate_user(username: str) -> None:
+    """Drop a user from the cache after their role or active flag changes."""
+    user_cache.delete(username)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Create JWT access token."""
@@ -42,6 +48,50 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def hash_refresh_token(token: str) -> str:
+    """Hash a refresh token for storage.
+
+    Refresh tokens are long random strings, so a fast SHA-256 is enough here and
+    keeps /token/refresh free of bcrypt work.
+    """
+    return hashlib.sha256(token.encode()).hexdigest()
+
+async def issue_refresh_token(user: User) -> str:
+    """Create and store a new refresh token for a user."""
+    token = secrets.token_urlsafe(48)
+    expires_at = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    await create_refresh_token(user.id, hash_refresh_token(token), expires_at)
+    return token
+
+async def create_token_pair(user: User) -> dict:
+    """Create an access token and a refresh token for a user."""
+    access_token = create_access_token(
+        data={"sub": user.username},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {
+        "access_token": access_token,
+        "refresh_token": await issue_refresh_token(user),
+        "token_type": "bearer"
+    }
+
+async def refresh_access_token(refresh_token: str) -> dict:
+    """Rotate a refresh token and mint a new access token, without password verification."""
+    new_token = secrets.token_urlsafe(48)
+    expires_at = datetime.utcnow() + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+    user = await rotate_refresh_token(hash_refresh_token(refresh_token), hash_refresh_token(new_token), expires_at)
+    if user is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    access_token = create_access_token(
+        data={"sub": user.username},
+        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {"access_token": access_token, "refresh_token": new_token, "token_type": "bearer"}
+
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     """Get current user from JWT token."""
     credentials_exception = HTTPException(
@@ -57,12 +107,13 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     except JWTError:
         raise credentials_exception
         
-    with Session(engine) as session:
-        statement = select(User).where(User.username == username)
-        user = session.exec(statement).first()
-        if user is None:
+    user = user_cache.get(username)
+    if user is None:
+        user = await get_user_by_username(username)
+        if user is None or not user.is_active:
             raise credentials_exception
-        return user
+        user_cache.set(username, user)
+    return user
 
 def check_admin_access(current_user: User = Depends(get_current_user)) -> User:
     """Check if user has admin access."""
@@ -84,25 +135,20 @@ def check_teacher_access(current_user: User = Depends(get_current_user)) -> User
 
 async def get_oauth_user(provider: str, token: dict) -> Optional[User]:
     """Get or create user from OAuth provider."""
-    with Session(engine) as session:
-        if provider == "google":
-            email = token.get("email")
-            statement = select(User).where(User.email == email)
-            user = session.exec(statement).first()
-            
-            if not user:
-                # Create new user
-                user = User(
-                    email=email,
-                    username=token.get("name", email),
-                    hashed_password="",  # OAuth users don't need password
-                    role=UserRole.STUDENT,  # Default role, can be changed by admin
-                    oauth_provider=provider,
-                    oauth_id=token.get("sub")
-                )
-                session.add(user)
-                session.commit()
-                session.refresh(user)
-            
-            return user
-    return None 
\ No newline at end of file
+    if provider == "google":
+        email = token.get("email")
+        user = await get_user_by_email(email)
+        
+        if not user:
+            # Create new user
+            user = await create_user(User(
+                email=email,
+                username=token.get("name", email),
+                hashed_password="",  # OAuth users don't need password
+                role=UserRole.STUDENT,  # Default role, can be changed by admin
+                oauth_provider=provider,
+                oauth_id=token.get("sub")
+            ))
+        
+        return user
+    return None
\ No newline at end of file
@@ -0,0 +1,230 @@
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Iterable
+
+logger = logging.getLogger(__name__)
+
+class TTLCache:
+    """
+    Thread-safe, size-bounded cache whose entries expire after a fixed time.
+
+    When the cache is full the least recently used entry is evicted. Hit, miss,
+    expiry and eviction counters are kept for tuning the size and TTL.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value for key, or default if it is missing or expired."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._data[key]
+                self.expirations += 1
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entries if the cache is full."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        """Remove a key if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def delete_many(self, keys: Iterable[Hashable]) -> None:
+        """Remove several keys, those present."""
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        """Return size and hit/miss/expiry/eviction counters."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+            }
+
+class RedisCache:
+    """
+    Cache kept in Redis and shared by every worker process, with the same
+    interface as TTLCache. Keys are strings and values must be JSON-serializable.
+
+    Entries expire after the TTL; the size is bounded by the server's
+    maxmemory policy, so evictions and expiries come from Redis's own
+    counters, while hits and misses are this process's. A failing server is
+    logged and treated as a miss.
+
+    Any client with redis-py's get, set, delete and info methods works, such
+    as LocalRedis.
+    """
+
+    def __init__(self, client, ttl: float, prefix: str = ""):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the cached value for key, or default if it is missing."""
+        try:
+            raw = self.client.get(self.prefix + key)
+        except Exception:
+            logger.warning("Cache read failed", exc_info=True)
+            raw = None
+        with self._lock:
+            if raw is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+        return json.loads(raw)
+
+    def set(self, key: str, value: Any) -> None:
+        """Store a value for the TTL."""
+        try:
+            self.client.set(self.prefix + key, json.dumps(value), ex=max(1, round(self.ttl)))
+        except Exception:
+            logger.warning("Cache write failed", exc_info=True)
+
+    def delete(self, key: str) -> None:
+        """Remove a key if present."""
+        self.delete_many([key])
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        """Remove several keys in one round trip."""
+        names = [self.prefix + key for key in keys]
+        if not names:
+            return
+        try:
+            self.client.delete(*names)
+        except Exception:
+            logger.warning("Cache invalidation failed", exc_info=True)
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the server's expiry/eviction counters."""
+        try:
+            server = self.client.info("stats")
+        except Exception:
+            server = {}
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "expirations": server.get("expired_keys"),
+                "evictions": server.get("evicted_keys"),
+            }
+
+class LocalRedis:
+    """
+    In-process stand-in for a Redis server, implementing the client methods
+    RedisCache uses, with least recently used eviction beyond maxsize keys.
+
+    It lets the shared cache code path run in tests and single-process
+    development without a server.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._expired = 0
+        self._evicted = 0
+
+    def get(self, name: str) -> str | None:
+        with self._lock:
+            entry = self._data.get(name)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._data[name]
+                self._expired += 1
+                return None
+            self._data.move_to_end(name)
+            return entry[1]
+
+    def set(self, name: str, value: str, ex: int | None = None) -> bool:
+        with self._lock:
+            self._data[name] = (time.monotonic() + ex if ex else float("inf"), value)
+            self._data.move_to_end(name)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._evicted += 1
+        return True
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            return sum(self._data.pop(name, None) is not None for name in names)
+
+    def info(self, section: str | None = None) -> dict:
+        with self._lock:
+            return {"expired_keys": self._expired, "evicted_keys": self._evicted}
+
+def create_cache(kind: str, maxsize: int, ttl: float, prefix: str, redis_url: str | None = None):
+    """
+    Create a cache backend.
+
+    Args:
+        kind (str): 'memory' (TTLCache, per process), 'redis' (RedisCache on the
+            server at redis_url, shared by all processes) or 'local' (RedisCache
+            on a LocalRedis, for tests)
+        maxsize (int): Maximum number of entries, for the in-process backends
+        ttl (float): Seconds an entry stays valid
+        prefix (str): Prefix of the Redis keys
+        redis_url (str, optional): Redis connection URL, for 'redis'
+
+    Returns:
+        TTLCache | RedisCache: The cache
+    """
+    if kind == "memory":
+        return TTLCache(maxsize=maxsize, ttl=ttl)
+    if kind == "redis":
+        try:
+            import redis
+        except ImportError as e:
+            raise ImportError("STUDENT_CACHE_BACKEND=redis requires the redis package (the 'redis' extra)") from e
+
+        return RedisCache(redis.Redis.from_url(redis_url, decode_responses=True), ttl, prefix)
+    if kind == "local":
+        return RedisCache(LocalRedis(maxsize), ttl, prefix)
+    raise ValueError(f"Unknown cache backend: {kind}")
@@ -0,0 +1,274 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import MemorySaver
+from app.crud import pop_idle_chat_threads
+from app.models import User
+from app.settings import (
+    CHECKPOINTER_BACKEND, CHECKPOINTER_SQLITE_PATH, CHECKPOINTER_POSTGRES_URI,
+    CHECKPOINT_MAX_PER_THREAD, CHECKPOINT_THREAD_TTL_SECONDS, CHECKPOINT_PRUNE_INTERVAL_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+def thread_id_for(user: User, session_id: str) -> str:
+    """
+    Build the conversation thread ID of a user's chat session.
+
+    Args:
+        user (User): The authenticated user
+        session_id (str): Client-chosen chat session name
+
+    Returns:
+        str: Thread ID unique to the user and session
+    """
+    return f"user-{user.id}:{session_id}"
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    In-process checkpointer keeping only the latest checkpoints of each thread.
+
+    Channel values are stored once per channel version, so trimming a
+    checkpoint also drops the versions no remaining checkpoint refers to.
+    Writes come from the event loop and deletions from the pruning thread, so
+    both hold a lock.
+    """
+
+    def __init__(self, max_per_thread: int):
+        super().__init__()
+        self.max_per_thread = max_per_thread
+        self.lock = threading.Lock()
+        # (thread_id, checkpoint_ns, checkpoint_id) -> the checkpoint's channel versions
+        self.channel_versions: dict[tuple[str, str, str], dict] = {}
+        # thread_id -> time.monotonic() of its latest checkpoint
+        self.last_used: dict[str, float] = {}
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        with self.lock:
+            saved = super().put(config, checkpoint, metadata, new_versions)
+            thread_id = saved["configurable"]["thread_id"]
+            checkpoint_ns = saved["configurable"]["checkpoint_ns"]
+            self.channel_versions[(thread_id, checkpoint_ns, checkpoint["id"])] = dict(checkpoint["channel_versions"])
+            self.last_used[thread_id] = time.monotonic()
+            checkpoints = self.storage[thread_id][checkpoint_ns]
+            # Checkpoint IDs are time-ordered, so the smallest are the oldest
+            ids = sorted(checkpoints)
+            stale = ids[:max(len(ids) - self.max_per_thread, 0)]
+            if not stale:
+                return saved
+            dropped = set()
+            for checkpoint_id in stale:
+                del checkpoints[checkpoint_id]
+                self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+                dropped.update(self.channel_versions.pop((thread_id, checkpoint_ns, checkpoint_id), {}).items())
+            for checkpoint_id in checkpoints:
+                dropped.difference_update(self.channel_versions.get((thread_id, checkpoint_ns, checkpoint_id), {}).items())
+            for channel, version in dropped:
+                self.blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+            return saved
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        with self.lock:
+            return super().put_writes(config, writes, task_id, task_path)
+
+    def delete_thread(self, thread_id: str) -> None:
+        self.delete_threads([thread_id])
+
+    def delete_threads(self, thread_ids: list[str]) -> None:
+        """Drop every checkpoint and pending write of the given threads."""
+        thread_ids = set(thread_ids)
+        with self.lock:
+            for thread_id in thread_ids:
+                self.storage.pop(thread_id, None)
+                self.last_used.pop(thread_id, None)
+            for store in (self.writes, self.blobs, self.channel_versions):
+                for key in [key for key in store if key[0] in thread_ids]:
+                    del store[key]
+
+    def delete_idle_threads(self, idle_seconds: float) -> int:
+        """
+        Drop the threads without a new checkpoint in this process for idle_seconds.
+
+        Returns:
+            int: Number of threads dropped
+        """
+        cutoff = time.monotonic() - idle_seconds
+        with self.lock:
+            idle = [thread_id for thread_id, used in self.last_used.items() if used < cutoff]
+        self.delete_threads(idle)
+        return len(idle)
+
+class _AsyncViaThreadsMixin:
+    """
+    Async checkpointer methods for a synchronous saver, run on worker threads.
+
+    SqliteSaver and PostgresSaver only implement the sync interface, while the
+    chat endpoints run the graph asynchronously.
+    """
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        checkpoints = await asyncio.to_thread(
+            lambda: list(self.list(config, filter=filter, before=before, limit=limit))
+        )
+        for checkpoint in checkpoints:
+            yield checkpoint
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, *args, **kwargs):
+        return await asyncio.to_thread(self.put_writes, *args, **kwargs)
+
+class _SqlRetentionMixin:
+    """
+    Retention for the SQL checkpointers, whose schema is owned by langgraph.
+
+    Subclasses set the table names and provide _execute(sql, params).
+    """
+    checkpoints_table = "checkpoints"
+    writes_table: str
+
+    def trim_threads(self, max_per_thread: int) -> None:
+        """Delete all but the latest max_per_thread checkpoints of every thread."""
+        stale = f"""
+            SELECT thread_id, checkpoint_ns, checkpoint_id FROM (
+                SELECT thread_id, checkpoint_ns, checkpoint_id, ROW_NUMBER() OVER (
+                    PARTITION BY thread_id, checkpoint_ns ORDER BY checkpoint_id DESC
+                ) AS position
+                FROM {self.checkpoints_table}
+            ) ranked WHERE position > {int(max_per_thread)}
+        """
+        for table in (self.writes_table, self.checkpoints_table):
+            self._execute(f"DELETE FROM {table} WHERE (thread_id, checkpoint_ns, checkpoint_id) IN ({stale})", ())
+
+    def delete_threads(self, thread_ids: list[str]) -> None:
+        """Drop every checkpoint and pending write of the given threads."""
+        for thread_id in thread_ids:
+            for table in self.thread_tables:
+                self._execute(f"DELETE FROM {table} WHERE thread_id = {self.placeholder}", (thread_id,))
+
+def _create_sqlite_saver() -> BaseCheckpointSaver:
+    """Create a SQLite checkpointer for local use (needs langgraph-checkpoint-sqlite)."""
+    try:
+        from langgraph.checkpoint.sqlite import SqliteSaver
+    except ImportError as e:
+        raise ImportError(
+            "CHECKPOINTER_BACKEND=sqlite requires the langgraph-checkpoint-sqlite package "
+            "(the 'checkpoint-sqlite' extra)"
+        ) from e
+
+    class BoundedSqliteSaver(_SqlRetentionMixin, _AsyncViaThreadsMixin, SqliteSaver):
+        writes_table = "writes"
+        thread_tables = ("writes", "checkpoints")
+        placeholder = "?"
+
+        def _execute(self, sql: str, params: tuple) -> None:
+            with self.lock:
+                self.conn.execute(sql, params)
+                self.conn.commit()
+
+    saver = BoundedSqliteSaver(sqlite3.connect(CHECKPOINTER_SQLITE_PATH, check_same_thread=False))
+    saver.setup()
+    return saver
+
+def _create_postgres_saver() -> BaseCheckpointSaver:
+    """Create a Postgres checkpointer for production (needs langgraph-checkpoint-postgres)."""
+    try:
+        from langgraph.checkpoint.postgres import PostgresSaver
+    except ImportError as e:
+        raise ImportError(
+            "CHECKPOINTER_BACKEND=postgres requires the langgraph-checkpoint-postgres package "
+            "(the 'checkpoint-postgres' extra)"
+        ) from e
+    from psycopg import Connection
+    from psycopg.rows import dict_row
+
+    class BoundedPostgresSaver(_SqlRetentionMixin, _AsyncViaThreadsMixin, PostgresSaver):
+        writes_table = "checkpoint_writes"
+        thread_tables = ("checkpoint_writes", "checkpoint_blobs", "checkpoints")
+        placeholder = "%s"
+
+        def _execute(self, sql: str, params: tuple) -> None:
+            with self.lock, self.conn.cursor() as cursor:
+                cursor.execute(sql, params)
+
+        def trim_threads(self, max_per_thread: int) -> None:
+            super().trim_threads(max_per_thread)
+            # Channel values are stored once per version; drop the versions no
+            # remaining checkpoint refers to.
+            self._execute("""
+                DELETE FROM checkpoint_blobs b WHERE NOT EXISTS (
+                    SELECT 1 FROM checkpoints c
+                    WHERE c.thread_id = b.thread_id AND c.checkpoint_ns = b.checkpoint_ns
+                    AND c.checkpoint -> 'channel_versions' ->> b.channel = b.version
+                )
+            """, ())
+
+    connection = Connection.connect(
+        CHECKPOINTER_POSTGRES_URI, autocommit=True, prepare_threshold=0, row_factory=dict_row
+    )
+    saver = BoundedPostgresSaver(connection)
+    saver.setup()
+    return saver
+
+def build_checkpointer(backend: str = CHECKPOINTER_BACKEND) -> BaseCheckpointSaver:
+    """
+    Create the checkpointer selected by CHECKPOINTER_BACKEND.
+
+    Args:
+        backend (str): 'memory', 'sqlite' or 'postgres'
+
+    Returns:
+        BaseCheckpointSaver: The checkpointer
+    """
+    if backend == "memory":
+        return BoundedMemorySaver(CHECKPOINT_MAX_PER_THREAD)
+    if backend == "sqlite":
+        return _create_sqlite_saver()
+    if backend == "postgres":
+        return _create_postgres_saver()
+    raise ValueError(f"Unknown checkpointer backend: {backend}")
+
+def prune_checkpoints(saver: BaseCheckpointSaver) -> int:
+    """
+    Apply the retention limits to a checkpointer.
+
+    Threads idle for longer than CHECKPOINT_THREAD_TTL_SECONDS are deleted, and
+    SQL checkpointers are trimmed to CHECKPOINT_MAX_PER_THREAD checkpoints per
+    thread (the memory checkpointer trims on every write).
+
+    The SQL checkpointers are shared, so the threads recorded as idle in the
+    database are deleted from them by whichever worker prunes first. Each
+    worker's memory checkpointer holds its own threads, so it drops the ones
+    idle in that process instead.
+
+    Returns:
+        int: Number of idle threads deleted
+    """
+    cutoff = datetime.utcnow() - timedelta(seconds=CHECKPOINT_THREAD_TTL_SECONDS)
+    idle_threads = pop_idle_chat_threads(cutoff)
+    if isinstance(saver, BoundedMemorySaver):
+        return saver.delete_idle_threads(CHECKPOINT_THREAD_TTL_SECONDS)
+    if idle_threads:
+        saver.delete_threads(idle_threads)
+    if isinstance(saver, _SqlRetentionMixin):
+        saver.trim_threads(CHECKPOINT_MAX_PER_THREAD)
+    return len(idle_threads)
+
+async def prune_checkpoints_periodically(saver: BaseCheckpointSaver) -> None:
+    """Run prune_checkpoints every CHECKPOINT_PRUNE_INTERVAL_SECONDS."""
+    while True:
+        await asyncio.sleep(CHECKPOINT_PRUNE_INTERVAL_SECONDS)
+        try:
+            deleted = await asyncio.to_thread(prune_checkpoints, saver)
+            if deleted:
+                logger.info("Deleted %d idle chat threads", deleted)
+        except Exception:
+            logger.exception("Checkpoint pruning failed")
@@ -0,0 +1,79 @@
+"""
+Command-line entry points for bulk data jobs.
+
+Usage:
+    python -m app.cli export student --format parquet --output students.parquet
+    python -m app.cli export student --class-name 9 --section A > class_9a.csv
+    python -m app.cli migrate
+    python -m app.cli check-indexes
+    python -m app.cli build-vector-index teacher
+"""
+import argparse
+import sys
+from app.crud import export_records, EXPORT_COLUMNS, EXPORT_MEDIA_TYPES
+from app.migrations import migrate_indexes, check_search_indexes, explain, search_lookups
+from app.models import StudentStatus
+from app.vector_index import vector_indexes
+
+def export(args: argparse.Namespace) -> None:
+    """Write an export to a file or to standard output."""
+    content = export_records(args.entity, args.format, args.class_name, args.section, args.status)
+    output = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        for piece in content:
+            output.write(piece)
+    finally:
+        if args.output:
+            output.close()
+
+def migrate(args: argparse.Namespace) -> None:
+    """Create the model indexes missing from the database."""
+    created = migrate_indexes()
+    print(f"Created {len(created)} index(es): {', '.join(created)}" if created else "All indexes exist")
+
+def check_indexes(args: argparse.Namespace) -> None:
+    """Print whether each search lookup uses its index; exit with status 1 if one does not."""
+    results = check_search_indexes()
+    for name, ok in results.items():
+        print(f"{'OK  ' if ok else 'FAIL'} {name}")
+        if not ok or args.verbose:
+            for line in explain(search_lookups()[name][0]):
+                print(f"       {line}")
+    if not all(results.values()):
+        sys.exit(1)
+
+def build_vector_index(args: argparse.Namespace) -> None:
+    """Re-embed every record into a new vector index, e.g. after changing the embedding model."""
+    for entity in args.entity or list(vector_indexes):
+        vector_indexes[entity].build()
+        print(f"Indexed {vector_indexes[entity].index.ntotal} {entity} record(s)")
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = commands.add_parser("export", help="Export students or teachers as CSV or Parquet")
+    export_parser.add_argument("entity", choices=list(EXPORT_COLUMNS))
+    export_parser.add_argument("--format", choices=list(EXPORT_MEDIA_TYPES), default="csv")
+    export_parser.add_argument("--class-name")
+    export_parser.add_argument("--section")
+    export_parser.add_argument("--status", type=StudentStatus, choices=list(StudentStatus))
+    export_parser.add_argument("--output", "-o", help="File to write; standard output if omitted")
+    export_parser.set_defaults(handler=export)
+
+    migrate_parser = commands.add_parser("migrate", help="Create indexes missing from existing tables")
+    migrate_parser.set_defaults(handler=migrate)
+
+    check_parser = commands.add_parser("check-indexes", help="Check that the search lookups use index scans")
+    check_parser.add_argument("--verbose", "-v", action="store_true", help="Print every query plan")
+    check_parser.set_defaults(handler=check_indexes)
+
+    vector_parser = commands.add_parser("build-vector-index", help="Rebuild the semantic search indexes")
+    vector_parser.add_argument("entity", nargs="*", choices=list(vector_indexes))
+    vector_parser.set_defaults(handler=build_vector_index)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+if __name__ == "__main__":
+    main()
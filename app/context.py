@@ -0,0 +1,158 @@
+import json
+import threading
+from typing import List
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import (
+    AnyMessage, BaseMessage, HumanMessage, RemoveMessage, SystemMessage, ToolMessage
+)
+from langgraph.graph import MessagesState
+from app.settings import CONTEXT_TOKEN_BUDGET, CONTEXT_RECENT_TOKEN_BUDGET, TOOL_OUTPUT_TOKEN_LIMIT
+
+# Rough characters-per-token ratio; exact counts would need a round trip to Gemini
+CHARS_PER_TOKEN = 4
+MESSAGE_OVERHEAD_TOKENS = 4
+# Tag of the summarization model calls, so streaming endpoints can leave them out
+SUMMARY_TAG = "context_summary"
+# Tool results are never elided below this, even when a single turn is over budget
+MIN_TOOL_OUTPUT_TOKENS = 100
+
+class AgentState(MessagesState):
+    """
+    Graph state: the conversation, a rolling summary of turns folded out of it,
+    and the prompt size statistics of the latest model call.
+    """
+    summary: str
+    context_stats: dict
+
+def message_text(message: BaseMessage) -> str:
+    """Return the text of a message, including any tool call arguments."""
+    content = message.content
+    if isinstance(content, list):
+        content = " ".join(part if isinstance(part, str) else str(part.get("text", part)) for part in content)
+    tool_calls = getattr(message, "tool_calls", None)
+    if tool_calls:
+        content += json.dumps(tool_calls, default=str)
+    return content
+
+def count_tokens(messages: List[BaseMessage]) -> int:
+    """Estimate the prompt tokens of a list of messages."""
+    return sum(len(message_text(message)) // CHARS_PER_TOKEN + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+def elide_tool_output(message: BaseMessage, limit: int = TOOL_OUTPUT_TOKEN_LIMIT) -> BaseMessage:
+    """Shorten a tool result longer than ``limit`` tokens, keeping its beginning."""
+    if not isinstance(message, ToolMessage) or not isinstance(message.content, str):
+        return message
+    max_chars = limit * CHARS_PER_TOKEN
+    if len(message.content) <= max_chars:
+        return message
+    elided = len(message.content) - max_chars
+    return message.model_copy(update={
+        "content": message.content[:max_chars] + f"\n... [{elided} characters elided from this tool result]"
+    })
+
+def _recent_start(messages: List[AnyMessage], budget: int) -> int:
+    """
+    Find where the recent part of the conversation starts.
+
+    The recent part is the longest suffix that fits in ``budget`` tokens and
+    starts at a user message, so tool calls are never separated from their
+    results. The latest user turn is always kept.
+    """
+    turn_starts = [i for i, message in enumerate(messages) if isinstance(message, HumanMessage)]
+    if not turn_starts:
+        return 0
+    start = turn_starts[-1]
+    for candidate in reversed(turn_starts[:-1]):
+        if count_tokens(messages[candidate:]) > budget:
+            break
+        start = candidate
+    return start
+
+async def _summarize(llm: BaseChatModel, summary: str, messages: List[BaseMessage]) -> str:
+    """Fold messages into the rolling summary."""
+    transcript = "\n".join(f"{message.type}: {message_text(message)}" for message in messages)
+    prompt = (
+        "Update the summary of a conversation between a user and a college management assistant. "
+        "Keep names, IDs, roll numbers and any facts the assistant may need later; drop the rest.\n\n"
+        f"Current summary:\n{summary or '(none)'}\n\nNew messages:\n{transcript}\n\nUpdated summary:"
+    )
+    return (await llm.ainvoke([HumanMessage(content=prompt)], config={"tags": [SUMMARY_TAG]})).content
+
+class ContextMetrics:
+    """Totals of estimated prompt tokens before and after context management."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+        self.summarizations = 0
+
+    def record(self, stats: dict) -> None:
+        with self._lock:
+            self.calls += 1
+            self.tokens_before += stats["prompt_tokens_before"]
+            self.tokens_after += stats["prompt_tokens_after"]
+            self.summarizations += stats["summarized_messages"] > 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self.calls,
+                "avg_prompt_tokens_before": round(self.tokens_before / self.calls) if self.calls else 0,
+                "avg_prompt_tokens_after": round(self.tokens_after / self.calls) if self.calls else 0,
+                "summarizations": self.summarizations,
+            }
+
+context_metrics = ContextMetrics()
+
+async def build_prompt(state: AgentState, system_message: str, llm: BaseChatModel) -> tuple[List[BaseMessage], dict]:
+    """
+    Build a model prompt that stays under CONTEXT_TOKEN_BUDGET.
+
+    Tool results longer than TOOL_OUTPUT_TOKEN_LIMIT are elided in the prompt.
+    If the conversation is still over budget, the turns before the most recent
+    CONTEXT_RECENT_TOKEN_BUDGET tokens are folded into the rolling summary and
+    removed from the state. If the current turn alone is over budget, its tool
+    results are elided further.
+
+    Args:
+        state (AgentState): Current graph state
+        system_message (str): Role-specific system prompt
+        llm (BaseChatModel): Model used to update the summary
+
+    Returns:
+        tuple[List[BaseMessage], dict]: The prompt, and the state updates to
+            return from the node (removed messages, summary and prompt statistics)
+    """
+    messages = state["messages"]
+    summary = state.get("summary", "")
+    system = [SystemMessage(content=system_message)]
+    tokens_before = count_tokens(system + messages)
+
+    elided = [elide_tool_output(message) for message in messages]
+    updates = {"messages": []}
+    start = 0
+    if count_tokens(system + elided) + len(summary) // CHARS_PER_TOKEN > CONTEXT_TOKEN_BUDGET:
+        start = _recent_start(elided, CONTEXT_RECENT_TOKEN_BUDGET)
+        if start > 0:
+            summary = await _summarize(llm, summary, elided[:start])
+            updates["summary"] = summary
+            updates["messages"] = [RemoveMessage(id=message.id) for message in messages[:start]]
+
+    if summary:
+        system.append(SystemMessage(content=f"Summary of the earlier conversation:\n{summary}"))
+    prompt = system + elided[start:]
+    tool_results = [message for message in prompt if isinstance(message, ToolMessage)]
+    if tool_results and count_tokens(prompt) > CONTEXT_TOKEN_BUDGET:
+        # The current turn alone is over budget: share what is left between its tool results
+        remaining = CONTEXT_TOKEN_BUDGET - count_tokens([m for m in prompt if not isinstance(m, ToolMessage)])
+        limit = max(remaining // len(tool_results), MIN_TOOL_OUTPUT_TOKENS)
+        prompt = [elide_tool_output(message, limit) for message in prompt]
+    updates["context_stats"] = {
+        "prompt_tokens_before": tokens_before,
+        "prompt_tokens_after": count_tokens(prompt),
+        "summarized_messages": start,
+    }
+    context_metrics.record(updates["context_stats"])
+    return prompt, updates
@@ -1,11 +1,28 @@
 from sqlmodel import Session
-from typing import List
+from sqlalchemy import bindparam, delete, func, insert, literal, select, text, update, cast, Boolean, Date, DateTime, Enum, Integer, String, Row
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import IO, Callable, Iterator, List
+from io import BytesIO
+from itertools import islice
+from dataclasses import dataclass, field
+import threading
 import pandas as pd
-from datetime import datetime, date
+from datetime import date, datetime
 from fastapi import HTTPException
+from pydantic import TypeAdapter, ValidationError
 from app.database import engine
-from app.models import Student, Teacher, StudentStatus, Gender, User, UserRole
+from app.cache import TTLCache, create_cache
+from app.events import notify_change, on_change
+from app.ngram import NgramIndex
+from app.settings import (
+    IMPORT_CHUNK_SIZE, IMPORT_MAX_REPORTED_ERRORS, EXPORT_BATCH_SIZE, NAME_SEARCH_THRESHOLD, STUDENT_CACHE_BACKEND,
+    STUDENT_CACHE_MAXSIZE, STUDENT_CACHE_TTL_SECONDS, STUDENT_CACHE_REDIS_URL
+)
+from app.models import Student, Teacher, StudentStatus, Gender, User, UserRole, ImportMode, ChatThread
 from app.utils import get_password_hash
+from app.vector_index import search_similar
 
 def add_student(
     roll_no: str,
@@ -68,8 +85,104 @@ def add_student(
         session.add(student)
         session.commit()
         session.refresh(student)
+    notify_change("student", "insert", [student.id])
     return student
 
+class _StudentCache:
+    """
+    Read-through cache of the students returned by get_student,
+    get_students_by_ids and search_student_by_roll_no.
+
+    Students are cached by ID, and roll numbers map to IDs. A roll number
+    entry is only used while the student it points to is cached with that
+    roll number, so writes only have to drop the ID entries; the CRUD
+    functions do that synchronously through on_change. A lookup that read the
+    database before a write in this process invalidated the cache does not
+    store what it read.
+
+    Hits and misses are counted per lookup, not per backend read, since a roll
+    number lookup reads two keys.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        # Shared backends hold JSON; the in-process one holds the students themselves
+        self._serialize = not isinstance(backend, TTLCache)
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _count(self, student: Student | None) -> Student | None:
+        with self._lock:
+            if student is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return student
+
+    def _get(self, student_id: int) -> Student | None:
+        value = self.backend.get(f"id:{student_id}")
+        if value is None or not self._serialize:
+            return value
+        return Student.model_validate(value)
+
+    def get(self, student_id: int) -> Student | None:
+        """Return the cached student, or None on a miss."""
+        return self._count(self._get(student_id))
+
+    def get_by_roll_no(self, roll_no: str) -> Student | None:
+        """Return the cached student with a roll number, or None on a miss."""
+        student_id = self.backend.get(f"roll:{roll_no}")
+        student = self._get(student_id) if student_id is not None else None
+        return self._count(student if student is not None and student.roll_no == roll_no else None)
+
+    def get_many(self, student_ids: List[int]) -> tuple[List[Student], List[int]]:
+        """Return the cached students among some IDs and the IDs that missed."""
+        students, missing = [], []
+        for student_id in dict.fromkeys(student_ids):
+            student = self.get(student_id)
+            if student is None:
+                missing.append(student_id)
+            else:
+                students.append(student)
+        return students, missing
+
+    def put(self, student: Student, generation: int) -> None:
+        """Cache a student read while the cache was at ``generation``."""
+        with self._lock:
+            if generation != self.generation:
+                return
+            self.backend.set(f"id:{student.id}", student.model_dump(mode="json") if self._serialize else student)
+            self.backend.set(f"roll:{student.roll_no}", student.id)
+
+    def invalidate(self, student_ids: List[int]) -> None:
+        """Drop students from the cache."""
+        with self._lock:
+            self.generation += 1
+            self.backend.delete_many(f"id:{student_id}" for student_id in student_ids)
+
+    def stats(self) -> dict:
+        """Return the backend's stats with the hit/miss counters of the lookups."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            counters = {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+        return {"backend": STUDENT_CACHE_BACKEND, **self.backend.stats(), **counters}
+
+student_cache = _StudentCache(create_cache(
+    STUDENT_CACHE_BACKEND, STUDENT_CACHE_MAXSIZE, STUDENT_CACHE_TTL_SECONDS, "student:", STUDENT_CACHE_REDIS_URL
+))
+
+@on_change
+def _invalidate_cached_students(entity: str, action: str, ids: List[int]) -> None:
+    # New students cannot be cached yet
+    if entity == "student" and action != "insert":
+        student_cache.invalidate(ids)
+
 def get_student(student_id: int) -> Student | None:
     """
     Get a student by their ID.
@@ -80,8 +193,35 @@ def get_student(student_id: int) -> Student | None:
     Returns:
         Student | None: The student object if found, None otherwise
     """
+    student = student_cache.get(student_id)
+    if student is not None:
+        return student
+    generation = student_cache.generation
+    with Session(engine) as session:
+        student = session.get(Student, student_id)
+    if student is not None:
+        student_cache.put(student, generation)
+    return student
+
+def get_students_by_ids(student_ids: List[int]) -> List[Student]:
+    """
+    Get several students by their IDs, querying only those not cached.
+    
+    Args:
+        student_ids (List[int]): The IDs of the students
+
+    Returns:
+        List[Student]: The students found, in no particular order
+    """
+    students, missing = student_cache.get_many(student_ids)
+    if not missing:
+        return students
+    generation = student_cache.generation
     with Session(engine) as session:
-        return session.get(Student, student_id)
+        loaded = session.query(Student).filter(Student.id.in_(missing)).all()
+    for student in loaded:
+        student_cache.put(student, generation)
+    return students + loaded
 
 def get_all_students() -> List[Student]:
     """
@@ -103,8 +243,15 @@ def search_student_by_roll_no(roll_no: str) -> Student | None:
     Returns:
         Student | None: The student object if found, None otherwise
     """
+    student = student_cache.get_by_roll_no(roll_no)
+    if student is not None:
+        return student
+    generation = student_cache.generation
     with Session(engine) as session:
-        return session.query(Student).filter(Student.roll_no == roll_no).first()
+        student = session.query(Student).filter(Student.roll_no == roll_no).first()
+    if student is not None:
+        student_cache.put(student, generation)
+    return student
 
 def search_students_by_class_section(class_name: str, section: str) -> List[Student]:
     """
@@ -123,6 +270,18 @@ def search_students_by_class_section(class_name: str, section: str) -> List[Stud
             Student.section == section
         ).all()
 
+def _status_filter(status: StudentStatus):
+    """
+    ``current_status = <status>`` with the status written into the SQL.
+
+    psycopg prepares statements on the server after a few executions, and a
+    generic plan for ``current_status = $1`` cannot use the partial index
+    ix_student_current_status_not_active; a literal status can.
+    """
+    return Student.current_status == bindparam(
+        "current_status", status, type_=Student.current_status.type, unique=True, literal_execute=True
+    )
+
 def search_students_by_status(status: StudentStatus) -> List[Student]:
     """
     Search for students by their current status.
@@ -134,7 +293,318 @@ def search_students_by_status(status: StudentStatus) -> List[Student]:
         List[Student]: List of matching student objects
     """
     with Session(engine) as session:
-        return session.query(Student).filter(Student.current_status == status).all()
+        return session.query(Student).filter(_status_filter(status)).all()
+
+# Columns students can be counted by, and the columns list_students returns by default
+STUDENT_GROUP_COLUMNS = ['class_name', 'section', 'current_status', 'gender']
+STUDENT_SUMMARY_COLUMNS = ['id', 'roll_no', 'name', 'class_name', 'section', 'current_status']
+TEACHER_GROUP_COLUMNS = ['department', 'subject']
+# Everything but the password hash
+USER_PUBLIC_COLUMNS = ['id', 'username', 'email', 'role', 'is_active', 'created_at', 'oauth_provider']
+MAX_PAGE_SIZE = 200
+
+def _columns(model, names: List[str], allowed: List[str]) -> list:
+    """Resolve column names of a model, rejecting any outside ``allowed``."""
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown column(s) {', '.join(unknown)}; choose from {', '.join(allowed)}")
+    return [getattr(model, name) for name in names]
+
+def _student_filters(class_name: str | None, section: str | None, status: StudentStatus | None) -> list:
+    filters = []
+    if class_name is not None:
+        filters.append(Student.class_name == class_name)
+    if section is not None:
+        filters.append(Student.section == section)
+    if status is not None:
+        filters.append(_status_filter(status))
+    return filters
+
+def _group_count_statement(model, group_by: List[str] | None, allowed: List[str], filters: list, limit: int | None = None):
+    """Build ``SELECT <group_by>, count(*) ... GROUP BY <group_by>``, largest groups first."""
+    columns = _columns(model, group_by or [], allowed)
+    count = func.count().label("count")
+    statement = select(*columns, count).select_from(model).where(*filters)
+    if columns:
+        statement = statement.group_by(*columns).order_by(count.desc(), *columns)
+    if limit is not None:
+        statement = statement.limit(limit)
+    return statement
+
+def _keyset_statement(model, names: List[str], allowed: List[str], filters: list, after_id: int, limit: int | None):
+    """
+    Build a column-projected query of the rows after a primary key, ordered by it.
+
+    ``limit`` is capped at MAX_PAGE_SIZE; None means no limit, for streaming.
+    """
+    names = list(names)
+    if "id" not in names:
+        # The ID is the pagination cursor, so it is always returned
+        names.insert(0, "id")
+    statement = select(*_columns(model, names, allowed)).where(model.id > after_id, *filters).order_by(model.id)
+    if limit is not None:
+        statement = statement.limit(max(1, min(limit, MAX_PAGE_SIZE)))
+    return statement
+
+def student_list_statement(
+    columns: List[str] | None,
+    class_name: str | None,
+    section: str | None,
+    status: StudentStatus | None,
+    after_id: int = 0,
+    limit: int | None = None
+):
+    """Build a keyset-paginated, column-projected student query ordered by ID."""
+    return _keyset_statement(
+        Student, columns or STUDENT_SUMMARY_COLUMNS, list(Student.__table__.columns.keys()),
+        _student_filters(class_name, section, status), after_id, limit
+    )
+
+def teacher_list_statement(
+    columns: List[str] | None,
+    department: str | None,
+    subject: str | None,
+    after_id: int = 0,
+    limit: int | None = None
+):
+    """Build a keyset-paginated, column-projected teacher query ordered by ID."""
+    filters = []
+    if department is not None:
+        filters.append(Teacher.department == department)
+    if subject is not None:
+        filters.append(Teacher.subject == subject)
+    allowed = list(Teacher.__table__.columns.keys())
+    return _keyset_statement(Teacher, columns or allowed, allowed, filters, after_id, limit)
+
+def user_list_statement(role: UserRole | None, is_active: bool | None, after_id: int = 0, limit: int | None = None):
+    """Build a keyset-paginated user query returning only USER_PUBLIC_COLUMNS."""
+    filters = []
+    if role is not None:
+        filters.append(User.role == role)
+    if is_active is not None:
+        filters.append(User.is_active == is_active)
+    return _keyset_statement(User, USER_PUBLIC_COLUMNS, USER_PUBLIC_COLUMNS, filters, after_id, limit)
+
+def count_students(
+    group_by: List[str] | None = None,
+    class_name: str | None = None,
+    section: str | None = None,
+    status: StudentStatus | None = None
+) -> List[dict]:
+    """
+    Count students in the database, optionally per group.
+    
+    Args:
+        group_by (List[str] | None): Columns to group by, any of class_name, section,
+            current_status and gender. Omit for a single total.
+        class_name (str | None): Only count students of this class
+        section (str | None): Only count students of this section
+        status (StudentStatus | None): Only count students with this status
+
+    Returns:
+        List[dict]: One ``{<group columns>..., "count"}`` dict per group, largest first
+    """
+    statement = _group_count_statement(
+        Student, group_by, STUDENT_GROUP_COLUMNS, _student_filters(class_name, section, status)
+    )
+    with Session(engine) as session:
+        return [dict(row) for row in session.execute(statement).mappings()]
+
+def top_student_groups(group_by: List[str], n: int = 5, status: StudentStatus | None = None) -> List[dict]:
+    """
+    Get the largest groups of students, such as the classes with the most students.
+    
+    Args:
+        group_by (List[str]): Columns to group by, any of class_name, section,
+            current_status and gender
+        n (int): Number of groups to return
+        status (StudentStatus | None): Only count students with this status
+
+    Returns:
+        List[dict]: The ``n`` largest groups as ``{<group columns>..., "count"}`` dicts
+    """
+    statement = _group_count_statement(
+        Student, group_by, STUDENT_GROUP_COLUMNS, _student_filters(None, None, status), limit=n
+    )
+    with Session(engine) as session:
+        return [dict(row) for row in session.execute(statement).mappings()]
+
+def list_students(
+    columns: List[str] | None = None,
+    class_name: str | None = None,
+    section: str | None = None,
+    status: StudentStatus | None = None,
+    after_id: int = 0,
+    limit: int = 50
+) -> List[dict]:
+    """
+    List students page by page, returning only the requested columns.
+    
+    Args:
+        columns (List[str] | None): Student columns to return; defaults to id, roll_no,
+            name, class_name, section and current_status. The id is always included.
+        class_name (str | None): Only list students of this class
+        section (str | None): Only list students of this section
+        status (StudentStatus | None): Only list students with this status
+        after_id (int): Return students with an ID greater than this, i.e. the last
+            ID of the previous page
+        limit (int): Page size, at most 200
+
+    Returns:
+        List[dict]: One dict per student, ordered by ID
+    """
+    statement = student_list_statement(columns, class_name, section, status, after_id, limit)
+    with Session(engine) as session:
+        return [dict(row) for row in session.execute(statement).mappings()]
+
+def _student_projection(columns: List[str] | None) -> list:
+    """Resolve student columns to select, defaulting to STUDENT_SUMMARY_COLUMNS; the ID is always included."""
+    names = list(columns or STUDENT_SUMMARY_COLUMNS)
+    if "id" not in names:
+        names.insert(0, "id")
+    return _columns(Student, names, list(Student.__table__.columns.keys()))
+
+def _trigram_name_search_statement(name: str, columns: List[str] | None, k: int):
+    """
+    Build a pg_trgm name search, served by the ix_student_name_trgm GIN index.
+
+    ``<%`` matches names containing a word similar to the query, above
+    pg_trgm.word_similarity_threshold.
+    """
+    score = func.word_similarity(name, Student.name).label("score")
+    return (
+        select(*_student_projection(columns), score)
+        .where(literal(name).op("<%")(Student.name))
+        .order_by(score.desc(), Student.id)
+        .limit(k)
+    )
+
+class _StudentNameIndex:
+    """
+    In-process trigram index of student names, for databases without pg_trgm.
+
+    It is loaded on first use. Student writes only mark the IDs they changed,
+    since notify_change may run inside the event loop; those names are re-read
+    before the next search.
+    """
+
+    def __init__(self):
+        self.index = NgramIndex()
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._stale: set[int] = set()
+
+    def mark_stale(self, student_ids: List[int]) -> None:
+        with self._lock:
+            self._stale.update(student_ids)
+
+    def _refresh(self) -> None:
+        with Session(engine) as session:
+            if not self._loaded:
+                statement = select(Student.id, Student.name).execution_options(yield_per=EXPORT_BATCH_SIZE)
+                for student_id, name in session.execute(statement):
+                    self.index.add(student_id, name)
+                self._loaded = True
+                self._stale.clear()
+                return
+            stale = list(self._stale)
+            self._stale.clear()
+            for start in range(0, len(stale), EXPORT_BATCH_SIZE):
+                batch = stale[start:start + EXPORT_BATCH_SIZE]
+                names = dict(session.execute(select(Student.id, Student.name).where(Student.id.in_(batch))).all())
+                for student_id in batch:
+                    if student_id in names:
+                        self.index.add(student_id, names[student_id])
+                    else:
+                        self.index.remove(student_id)
+
+    def search(self, name: str, k: int) -> List[tuple[int, float]]:
+        """Return the ``(id, score)`` of the k best matching students."""
+        with self._lock:
+            if not self._loaded or self._stale:
+                self._refresh()
+        return self.index.search(name, k, NAME_SEARCH_THRESHOLD)
+
+student_name_index = _StudentNameIndex()
+
+@on_change
+def _mark_student_names_stale(entity: str, action: str, ids: List[int]) -> None:
+    if entity == "student":
+        student_name_index.mark_stale(ids)
+
+def _rank_rows(rows, matches: List[tuple[int, float]]) -> List[dict]:
+    """Order fetched rows like the (id, score) matches and add the scores."""
+    by_id = {row["id"]: dict(row) for row in rows}
+    return [{**by_id[student_id], "score": score} for student_id, score in matches if student_id in by_id]
+
+def search_students_by_name(name: str, k: int = 10, columns: List[str] | None = None) -> List[dict]:
+    """
+    Search for students by a partial or misspelled name, best matches first.
+    
+    Args:
+        name (str): The name, or part of it, to look for
+        k (int): Maximum number of students to return, at most 200
+        columns (List[str] | None): Student columns to return; defaults to id, roll_no,
+            name, class_name, section and current_status
+
+    Returns:
+        List[dict]: One dict per matching student with a ``score`` between 0 and 1
+    """
+    k = max(1, min(k, MAX_PAGE_SIZE))
+    with Session(engine) as session:
+        if engine.dialect.name == "postgresql":
+            session.execute(
+                text("SELECT set_config('pg_trgm.word_similarity_threshold', :threshold, true)"),
+                {"threshold": str(NAME_SEARCH_THRESHOLD)}
+            )
+            statement = _trigram_name_search_statement(name, columns, k)
+            return [dict(row) for row in session.execute(statement).mappings()]
+        matches = student_name_index.search(name, k)
+        statement = select(*_student_projection(columns)).where(Student.id.in_([student_id for student_id, _ in matches]))
+        return _rank_rows(session.execute(statement).mappings(), matches)
+
+TEACHER_SUMMARY_COLUMNS = ['id', 'name', 'email', 'department', 'subject']
+
+def _semantic_search_statement(entity: str, matches: List[tuple[int, float]]):
+    """Fetch the summary columns of the students or teachers in ``(id, score)`` matches."""
+    ids = [record_id for record_id, _ in matches]
+    if entity == "student":
+        return select(*_student_projection(None)).where(Student.id.in_(ids))
+    return select(*_columns(Teacher, TEACHER_SUMMARY_COLUMNS, TEACHER_SUMMARY_COLUMNS)).where(Teacher.id.in_(ids))
+
+def semantic_search(query: str, entity: str = "teacher", k: int = 5) -> List[dict]:
+    """
+    Find students or teachers matching a free-text description, e.g. "teachers
+    of physics in the science department", best matches first.
+    
+    Args:
+        query (str): Description of the people to look for
+        entity (str): 'student' or 'teacher'
+        k (int): Maximum number of records to return, at most 200
+
+    Returns:
+        List[dict]: One dict of summary columns per match with a ``score`` between -1 and 1
+    """
+    k = max(1, min(k, MAX_PAGE_SIZE))
+    matches = search_similar(entity, query, k)
+    with Session(engine) as session:
+        return _rank_rows(session.execute(_semantic_search_statement(entity, matches)).mappings(), matches)
+
+def update_returning_statement(model, record_id: int, values: dict):
+    """
+    Build a single ``UPDATE ... RETURNING`` of the fields of one record that
+    are not None, or a plain lookup if there is nothing to change.
+    """
+    values = {key: value for key, value in values.items() if value is not None}
+    if not values:
+        return select(model).where(model.id == record_id)
+    return (
+        update(model)
+        .where(model.id == record_id)
+        .values(**values)
+        .returning(model)
+        .execution_options(synchronize_session=False)
+    )
 
 def update_student(
     student_id: int,
@@ -178,44 +648,29 @@ def update_student(
     Returns:
         Student | None: Updated student object if found, None otherwise
     """
-    with Session(engine) as session:
-        student = session.get(Student, student_id)
-        if student:
-            # Update only the provided fields
-            if roll_no is not None:
-                student.roll_no = roll_no
-            if name is not None:
-                student.name = name
-            if date_of_birth is not None:
-                student.date_of_birth = date_of_birth
-            if class_name is not None:
-                student.class_name = class_name
-            if section is not None:
-                student.section = section
-            if gender is not None:
-                student.gender = gender
-            if current_status is not None:
-                student.current_status = current_status
-            if cnic_or_bform is not None:
-                student.cnic_or_bform = cnic_or_bform
-            if contact_no is not None:
-                student.contact_no = contact_no
-            if email is not None:
-                student.email = email
-            if father_guardian_name is not None:
-                student.father_guardian_name = father_guardian_name
-            if father_guardian_contact is not None:
-                student.father_guardian_contact = father_guardian_contact
-            if father_guardian_cnic is not None:
-                student.father_guardian_cnic = father_guardian_cnic
-            if permanent_address is not None:
-                student.permanent_address = permanent_address
-            if religion is not None:
-                student.religion = religion
-            
-            session.commit()
-            session.refresh(student)
-        return student
+    values = {
+        "roll_no": roll_no,
+        "name": name,
+        "date_of_birth": date_of_birth,
+        "class_name": class_name,
+        "section": section,
+        "gender": gender,
+        "current_status": current_status,
+        "cnic_or_bform": cnic_or_bform,
+        "contact_no": contact_no,
+        "email": email,
+        "father_guardian_name": father_guardian_name,
+        "father_guardian_contact": father_guardian_contact,
+        "father_guardian_cnic": father_guardian_cnic,
+        "permanent_address": permanent_address,
+        "religion": religion
+    }
+    with Session(engine, expire_on_commit=False) as session:
+        student = session.scalars(update_returning_statement(Student, student_id, values)).one_or_none()
+        session.commit()
+    if student:
+        notify_change("student", "update", [student.id])
+    return student
 
 def delete_student(student_id: int) -> bool:
     """
@@ -228,84 +683,615 @@ def delete_student(student_id: int) -> bool:
         bool: True if deleted successfully, False if student not found
     """
     with Session(engine) as session:
-        student = session.get(Student, student_id)
-        if student:
-            session.delete(student)
-            session.commit()
-            return True
-        return False
+        deleted = session.execute(delete(Student).where(Student.id == student_id).returning(Student.id)).first()
+        session.commit()
+    if deleted:
+        notify_change("student", "delete", [student_id])
+    return deleted is not None
+
+# Every column but the primary key, the unique ones and the linked user account can be changed in bulk
+STUDENT_BULK_UPDATE_COLUMNS = [
+    column for column in Student.__table__.columns.keys() if column not in ('id', 'roll_no', 'cnic_or_bform', 'user_id')
+]
+# Validators turning bulk-update values, e.g. JSON strings, into each column's type
+STUDENT_BULK_UPDATE_TYPES = {
+    column: TypeAdapter(Student.model_fields[column].annotation) for column in STUDENT_BULK_UPDATE_COLUMNS
+}
 
-def bulk_import_students(file_content: bytes, file_type: str) -> List[Student]:
+def _student_where(class_name: str | None, section: str | None, status: StudentStatus | None,
+                   student_ids: List[int] | None) -> list:
+    """Build the filters of a bulk update or delete, refusing to match every student."""
+    filters = _student_filters(class_name, section, status)
+    if student_ids is not None:
+        filters.append(Student.id.in_(student_ids))
+    if not filters:
+        raise ValueError("Give at least one filter (class_name, section, status or student_ids)")
+    return filters
+
+def students_update_statement(
+    values: dict,
+    class_name: str | None = None,
+    section: str | None = None,
+    status: StudentStatus | None = None,
+    student_ids: List[int] | None = None
+):
+    """Build one ``UPDATE ... RETURNING`` of every matching student, returning their summary columns."""
+    unknown = set(values) - set(STUDENT_BULK_UPDATE_COLUMNS)
+    if unknown:
+        raise ValueError(f"Cannot bulk-update {', '.join(sorted(unknown))}; choose from {', '.join(STUDENT_BULK_UPDATE_COLUMNS)}")
+    if not values:
+        raise ValueError("Give at least one column to update")
+    coerced = {}
+    for column, value in values.items():
+        try:
+            coerced[column] = STUDENT_BULK_UPDATE_TYPES[column].validate_python(value)
+        except ValidationError as e:
+            raise ValueError(f"Invalid {column}: {e.errors()[0]['msg']}") from None
+    return (
+        update(Student)
+        .where(*_student_where(class_name, section, status, student_ids))
+        .values(**coerced)
+        .returning(*_student_projection(None))
+        .execution_options(synchronize_session=False)
+    )
+
+def students_delete_statement(
+    class_name: str | None = None,
+    section: str | None = None,
+    status: StudentStatus | None = None,
+    student_ids: List[int] | None = None
+):
+    """Build one ``DELETE ... RETURNING`` of every matching student, returning their summary columns."""
+    return (
+        delete(Student)
+        .where(*_student_where(class_name, section, status, student_ids))
+        .returning(*_student_projection(None))
+        .execution_options(synchronize_session=False)
+    )
+
+def update_students_where(
+    values: dict,
+    class_name: str | None = None,
+    section: str | None = None,
+    status: StudentStatus | None = None,
+    student_ids: List[int] | None = None
+) -> List[dict]:
     """
-    Import multiple students from a file.
+    Update every student matching the filters in one statement, e.g. promote a
+    class to the next one or mark a cohort as graduated. At least one filter is required.
     
     Args:
-        file_content (bytes): The file content
-        file_type (str): Type of file ('csv' or 'excel')
+        values (dict): Columns to set, e.g. {"class_name": "10"} or {"current_status": "graduated"};
+            roll_no and cnic_or_bform cannot be changed in bulk
+        class_name (str, optional): Only students in this class
+        section (str, optional): Only students in this section
+        status (StudentStatus, optional): Only students with this status
+        student_ids (List[int], optional): Only the students with these IDs
 
     Returns:
-        List[Student]: List of created student objects
+        List[dict]: id, roll_no, name, class_name, section and current_status of each updated student
+    """
+    statement = students_update_statement(values, class_name, section, status, student_ids)
+    with Session(engine) as session:
+        rows = [dict(row) for row in session.execute(statement).mappings()]
+        session.commit()
+    if rows:
+        notify_change("student", "update", [row["id"] for row in rows])
+    return rows
 
-    Raises:
-        HTTPException: If there are any validation or processing errors
+def delete_students_where(
+    class_name: str | None = None,
+    section: str | None = None,
+    status: StudentStatus | None = None,
+    student_ids: List[int] | None = None
+) -> List[dict]:
     """
+    Delete every student matching the filters in one statement. At least one filter is required.
+    
+    Args:
+        class_name (str, optional): Only students in this class
+        section (str, optional): Only students in this section
+        status (StudentStatus, optional): Only students with this status
+        student_ids (List[int], optional): Only the students with these IDs
+
+    Returns:
+        List[dict]: id, roll_no, name, class_name, section and current_status of each deleted student
+    """
+    statement = students_delete_statement(class_name, section, status, student_ids)
+    with Session(engine) as session:
+        rows = [dict(row) for row in session.execute(statement).mappings()]
+        session.commit()
+    if rows:
+        notify_change("student", "delete", [row["id"] for row in rows])
+    return rows
+
+STUDENT_IMPORT_COLUMNS = [
+    'roll_no', 'name', 'date_of_birth', 'class_name', 'section',
+    'gender', 'current_status', 'cnic_or_bform', 'contact_no',
+    'email', 'father_guardian_name', 'father_guardian_contact',
+    'father_guardian_cnic', 'permanent_address', 'religion'
+]
+
+STUDENT_UNIQUE_COLUMNS = ['roll_no', 'cnic_or_bform']
+
+@dataclass
+class StudentImportResult:
+    """
+    Outcome of a bulk student import.
+
+    Attributes:
+        errors (List[dict]): The first IMPORT_MAX_REPORTED_ERRORS rejected rows as
+            ``{"row", "column", "reason"}`` dicts, where ``row`` is the line number
+            in the uploaded file
+        rejected (int): Number of rejected rows, including those not in ``errors``
+        inserted (int): Number of new students
+        updated (int): Number of existing students whose data changed
+        unchanged (int): Number of existing students left as they were
+        rows_processed (int): Number of file rows read so far
+        cancelled (bool): Whether the import was stopped before the end of the file
+    """
+    errors: List[dict] = field(default_factory=list)
+    rejected: int = 0
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    rows_processed: int = 0
+    cancelled: bool = False
+
+def _read_xlsx_chunks(source: str | IO[bytes], chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Stream an .xlsx workbook's first sheet with openpyxl's read-only reader.
+
+    openpyxl is the engine pandas itself needs for .xlsx files, so it is imported
+    here rather than at module level, just as pandas does.
+
+    Args:
+        source (str | IO[bytes]): Path or binary file object of the workbook
+        chunk_size (int): Maximum number of rows per chunk
+
+    Yields:
+        pd.DataFrame: The next chunk of rows as strings, indexed by position in the sheet
+    """
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(source, read_only=True, data_only=True)
     try:
-        if file_type == 'csv':
-            df = pd.read_csv(pd.io.common.BytesIO(file_content))
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [str(value).strip() if value is not None else '' for value in next(rows, ())]
+        start = 0
+        while True:
+            batch = [
+                [None if value is None else str(value) for value in row]
+                for row in islice(rows, chunk_size)
+            ]
+            if not batch:
+                break
+            yield pd.DataFrame(
+                batch, columns=header, index=range(start, start + len(batch)), dtype=object
+            )
+            start += len(batch)
+    finally:
+        workbook.close()
+
+def _read_student_chunks(source: str | bytes | IO[bytes], file_type: str, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Read an uploaded student file as a sequence of bounded DataFrames.
+
+    CSV files are parsed incrementally by pandas and .xlsx files by openpyxl's
+    read-only reader, so memory is bounded by ``chunk_size`` rather than by the
+    file size. Legacy .xls files have no streaming reader and are loaded whole.
+    All cells are read as strings so that validation sees exactly what was uploaded.
+
+    Args:
+        source (str | bytes | IO[bytes]): Path, content or binary file object of the file
+        file_type (str): Type of file ('csv', 'xlsx' or 'xls')
+        chunk_size (int): Maximum number of rows per chunk
+
+    Yields:
+        pd.DataFrame: The next chunk of rows, indexed by position in the file
+    """
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+    if file_type == 'csv':
+        with pd.read_csv(source, chunksize=chunk_size, dtype=str) as reader:
+            yield from reader
+    elif file_type == 'xlsx':
+        yield from _read_xlsx_chunks(source, chunk_size)
+    else:
+        df = pd.read_excel(source, dtype=str)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+
+def _validate_student_chunk(
+    chunk: pd.DataFrame,
+    seen: dict[str, set]
+) -> tuple[List[dict], List[int], List[dict]]:
+    """
+    Validate a chunk of uploaded rows column-wise.
+
+    Args:
+        chunk (pd.DataFrame): Rows read from the uploaded file
+        seen (dict[str, set]): Values of each unique column accepted from earlier
+            chunks; updated in place with the values accepted from this chunk
+
+    Returns:
+        tuple[List[dict], List[int], List[dict]]: Student column values for every
+            valid row, the file line number of each, and an error dict for every
+            rejected row
+    """
+    values = chunk[STUDENT_IMPORT_COLUMNS].apply(lambda col: col.str.strip())
+    values['gender'] = values['gender'].str.lower()
+    values['current_status'] = values['current_status'].str.lower().fillna(StudentStatus.ACTIVE.value)
+    date_of_birth = pd.to_datetime(
+        values['date_of_birth'].str.split(n=1).str[0], format='%Y-%m-%d', errors='coerce'
+    )
+
+    checks = []
+    for column in STUDENT_IMPORT_COLUMNS:
+        checks.append((column, values[column].isna() | (values[column] == ''), "missing value"))
+    checks.append(('date_of_birth', date_of_birth.isna(), "invalid date, expected YYYY-MM-DD"))
+    checks.append(('gender', ~values['gender'].isin([g.value for g in Gender]),
+                   f"must be one of {[g.value for g in Gender]}"))
+    checks.append(('current_status', ~values['current_status'].isin([s.value for s in StudentStatus]),
+                   f"must be one of {[s.value for s in StudentStatus]}"))
+
+    errors = []
+    rejected = pd.Series(False, index=chunk.index)
+    for column, mask, reason in checks:
+        mask = mask & ~rejected
+        errors.extend({"row": int(index) + 2, "column": column, "reason": reason} for index in chunk.index[mask])
+        rejected |= mask
+
+    # Duplicates are only checked among rows that are otherwise valid, so a row is
+    # never rejected because it repeats a value from a row that was itself rejected.
+    for column in STUDENT_UNIQUE_COLUMNS:
+        candidates = values[column].where(~rejected)
+        mask = ~rejected & (candidates.duplicated(keep='first') | candidates.isin(seen[column]))
+        errors.extend(
+            {"row": int(index) + 2, "column": column, "reason": "duplicate value in file"}
+            for index in chunk.index[mask]
+        )
+        rejected |= mask
+
+    valid = values[~rejected]
+    for column in STUDENT_UNIQUE_COLUMNS:
+        seen[column].update(valid[column])
+    valid = valid.assign(date_of_birth=date_of_birth[~rejected].dt.date)
+    errors.sort(key=lambda error: error["row"])
+    return valid.to_dict('records'), [int(index) + 2 for index in valid.index], errors
+
+def _reject_stored_conflicts(
+    session: Session,
+    records: List[dict],
+    rows: List[int],
+    mode: ImportMode
+) -> tuple[List[dict], List[dict]]:
+    """
+    Reject the rows of a chunk whose unique values belong to students already stored.
+
+    In INSERT mode any stored roll number or CNIC/B-Form is a conflict. In
+    UPSERT mode a stored roll number is the student to update, so only a
+    CNIC/B-Form stored for a student with another roll number is.
+
+    Args:
+        session (Session): Session the chunk is written in
+        records (List[dict]): Validated student column values
+        rows (List[int]): File line number of each record
+        mode (ImportMode): Import mode
+
+    Returns:
+        tuple[List[dict], List[dict]]: The records that can be written, and an
+            error dict for every rejected row
+    """
+    roll_nos = [record['roll_no'] for record in records]
+    cnics = [record['cnic_or_bform'] for record in records]
+    stored = session.execute(
+        select(Student.roll_no, Student.cnic_or_bform)
+        .where(Student.roll_no.in_(roll_nos) | Student.cnic_or_bform.in_(cnics))
+    ).all()
+    stored_roll_nos = {row.roll_no for row in stored}
+    cnic_owners = {row.cnic_or_bform: row.roll_no for row in stored}
+
+    accepted, errors = [], []
+    for record, row in zip(records, rows):
+        if mode != ImportMode.UPSERT and record['roll_no'] in stored_roll_nos:
+            errors.append({"row": row, "column": "roll_no", "reason": "a student with this roll number already exists"})
+        elif cnic_owners.get(record['cnic_or_bform'], record['roll_no']) != record['roll_no'] or (
+            mode != ImportMode.UPSERT and record['cnic_or_bform'] in cnic_owners
+        ):
+            errors.append({"row": row, "column": "cnic_or_bform", "reason": "belongs to another student"})
+        else:
+            accepted.append(record)
+    return accepted, errors
+
+def _dialect_insert(table):
+    """
+    Build an INSERT for the engine's dialect so ON CONFLICT clauses are available.
+    """
+    if engine.dialect.name == 'sqlite':
+        return sqlite_insert(table)
+    return postgresql_insert(table)
+
+def _upsert_student_chunk(
+    session: Session,
+    records: List[dict],
+    result: StudentImportResult
+) -> tuple[List[Row], set[str]]:
+    """
+    Write only the new or changed rows of a chunk with INSERT ... ON CONFLICT (roll_no) DO UPDATE.
+
+    Args:
+        session (Session): Session the chunk is written in
+        records (List[dict]): Validated student column values
+        result (StudentImportResult): Result updated with the counts
+
+    Returns:
+        tuple[List[Row], set[str]]: ``(id, roll_no)`` rows of the written students
+            and the roll numbers of the chunk that were already stored
+    """
+    columns = [getattr(Student, column) for column in STUDENT_IMPORT_COLUMNS]
+    existing = {
+        row.roll_no: row
+        for row in session.execute(
+            select(*columns).where(Student.roll_no.in_([record['roll_no'] for record in records]))
+        )
+    }
+
+    changed = []
+    for record in records:
+        current = existing.get(record['roll_no'])
+        if current is None:
+            result.inserted += 1
+        elif any(getattr(current, column) != record[column] for column in STUDENT_IMPORT_COLUMNS):
+            result.updated += 1
         else:
-            df = pd.read_excel(pd.io.common.BytesIO(file_content))
-        
-        required_columns = [
-            'roll_no', 'name', 'date_of_birth', 'class_name', 'section',
-            'gender', 'current_status', 'cnic_or_bform', 'contact_no',
-            'email', 'father_guardian_name', 'father_guardian_contact',
-            'father_guardian_cnic', 'permanent_address', 'religion'
-        ]
-        
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            raise ValueError(f"Missing required columns: {missing_columns}")
-        
-        students = []
+            result.unchanged += 1
+            continue
+        changed.append(record)
+
+    if not changed:
+        return [], set(existing)
+    statement = _dialect_insert(Student)
+    statement = statement.on_conflict_do_update(
+        index_elements=[Student.roll_no],
+        set_={column: statement.excluded[column] for column in STUDENT_IMPORT_COLUMNS if column != 'roll_no'}
+    ).returning(Student.id, Student.roll_no)
+    return session.execute(statement, changed).all(), set(existing)
+
+def bulk_import_students(
+    source: str | bytes | IO[bytes],
+    file_type: str,
+    mode: ImportMode = ImportMode.INSERT,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+    progress: Callable[[StudentImportResult], bool] | None = None
+) -> StudentImportResult:
+    """
+    Import multiple students from a file.
+
+    The file is read in chunks of ``chunk_size`` rows. Each chunk is validated
+    column-wise and its valid rows are written in one batch and committed;
+    invalid rows, and rows whose roll number or CNIC/B-Form belongs to a
+    stored student, are reported instead of aborting the import.
+
+    In INSERT mode every valid row is written with a multi-row INSERT ... RETURNING.
+    In UPSERT mode each chunk is first compared with the students already stored
+    under the same roll numbers, and only new or changed rows are sent with
+    INSERT ... ON CONFLICT (roll_no) DO UPDATE.
+
+    Args:
+        source (str | bytes | IO[bytes]): Path, content or binary file object of the file
+        file_type (str): Type of file ('csv', 'xlsx' or 'xls')
+        mode (ImportMode, optional): Import mode. Defaults to INSERT.
+        chunk_size (int, optional): Rows per chunk. Defaults to IMPORT_CHUNK_SIZE.
+        progress (Callable[[StudentImportResult], bool], optional): Called with the
+            running result after every chunk; returning False stops the import
+            before the next chunk is read.
+
+    Returns:
+        StudentImportResult: The rejected rows and the inserted/updated/unchanged counts
+
+    Raises:
+        HTTPException: If the file cannot be read or a chunk cannot be written
+    """
+    try:
+        statement = insert(Student).returning(Student.id, Student.roll_no)
+        result = StudentImportResult()
+        seen = {column: set() for column in STUDENT_UNIQUE_COLUMNS}
         with Session(engine) as session:
-            for _, row in df.iterrows():
-                try:
-                    dob = datetime.strptime(str(row['date_of_birth']), '%Y-%m-%d').date()
-                    
-                    student = Student(
-                        roll_no=str(row['roll_no']),
-                        name=str(row['name']),
-                        date_of_birth=dob,
-                        class_name=str(row['class_name']),
-                        section=str(row['section']),
-                        gender=row['gender'].lower(),
-                        current_status=row['current_status'].lower(),
-                        cnic_or_bform=str(row['cnic_or_bform']),
-                        contact_no=str(row['contact_no']),
-                        email=str(row['email']),
-                        father_guardian_name=str(row['father_guardian_name']),
-                        father_guardian_contact=str(row['father_guardian_contact']),
-                        father_guardian_cnic=str(row['father_guardian_cnic']),
-                        permanent_address=str(row['permanent_address']),
-                        religion=str(row['religion'])
-                    )
-                    session.add(student)
-                    students.append(student)
-                except Exception as e:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Error processing row {_+2}: {str(e)}"
-                    )
-            
-            session.commit()
-            for student in students:
-                session.refresh(student)
-        
-        return students
-    
+            for chunk in _read_student_chunks(source, file_type, chunk_size):
+                missing_columns = [col for col in STUDENT_IMPORT_COLUMNS if col not in chunk.columns]
+                if missing_columns:
+                    raise ValueError(f"Missing required columns: {missing_columns}")
+
+                records, rows, errors = _validate_student_chunk(chunk, seen)
+                if records:
+                    records, conflicts = _reject_stored_conflicts(session, records, rows, mode)
+                    errors = sorted(errors + conflicts, key=lambda error: error["row"])
+                result.rejected += len(errors)
+                result.errors.extend(errors[:max(IMPORT_MAX_REPORTED_ERRORS - len(result.errors), 0)])
+                if records:
+                    try:
+                        if mode == ImportMode.UPSERT:
+                            written, existing = _upsert_student_chunk(session, records, result)
+                        else:
+                            written, existing = session.execute(statement, records).all(), set()
+                            result.inserted += len(records)
+                        session.commit()
+                    except IntegrityError:
+                        # Only reachable if another writer stored one of the values since
+                        # the conflict check; the message would echo the rows, so it is not kept
+                        raise ValueError(
+                            f"Rows {rows[0]}-{rows[-1]} conflict with students written by another "
+                            "import or request; re-run the import to report the conflicting rows"
+                        ) from None
+                    notify_change("student", "insert", [row.id for row in written if row.roll_no not in existing])
+                    notify_change("student", "update", [row.id for row in written if row.roll_no in existing])
+                result.rows_processed += len(chunk)
+
+                if progress is not None and progress(result) is False:
+                    result.cancelled = True
+                    break
+
+        return result
+
+    except SQLAlchemyError:
+        # Database errors include the statement parameters, i.e. personal data
+        raise HTTPException(status_code=400, detail="The students could not be written to the database")
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+EXPORT_COLUMNS = {
+    "student": (Student, ['id'] + STUDENT_IMPORT_COLUMNS),
+    "teacher": (Teacher, ['id', 'name', 'email', 'phone', 'department', 'subject'])
+}
+
+EXPORT_MEDIA_TYPES = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet"}
+COPY_CHUNK_BYTES = 1024 * 1024
+
+def _export_statement(entity: str, class_name: str | None, section: str | None, status: StudentStatus | None):
+    """
+    Build the export query of an entity, ordered by ID.
+
+    Enum columns are stored by member name, so they are selected as
+    lower(name), which is the member value the API and the importer use.
+    """
+    model, names = EXPORT_COLUMNS[entity]
+    columns = [
+        func.lower(cast(column, String)).label(column.key) if isinstance(column.type, Enum) else column
+        for column in (model.__table__.c[name] for name in names)
+    ]
+    filters = _student_filters(class_name, section, status) if entity == "student" else []
+    return select(*columns).where(*filters).order_by(model.id)
+
+def _copy_csv(statement) -> Iterator[bytes]:
+    """Stream a query as CSV with PostgreSQL's COPY ... TO STDOUT."""
+    sql = statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True})
+    connection = engine.raw_connection()
+    try:
+        with connection.cursor() as cursor:
+            with cursor.copy(f"COPY ({sql}) TO STDOUT WITH (FORMAT CSV, HEADER)") as copy:
+                buffer = bytearray()
+                for data in copy:
+                    buffer += data
+                    # COPY hands out one row at a time; send them in larger pieces
+                    if len(buffer) >= COPY_CHUNK_BYTES:
+                        yield bytes(buffer)
+                        buffer.clear()
+                if buffer:
+                    yield bytes(buffer)
+        connection.commit()
+    finally:
+        connection.close()
+
+def _export_chunks(statement, batch_size: int) -> Iterator[pd.DataFrame]:
+    """Read a query from a server-side cursor as DataFrames of batch_size rows."""
+    with Session(engine) as session:
+        result = session.execute(statement, execution_options={"yield_per": batch_size})
+        columns = list(result.keys())
+        for rows in result.partitions():
+            yield pd.DataFrame.from_records(rows, columns=columns)
+
+def _write_csv(statement, batch_size: int) -> Iterator[bytes]:
+    header = True
+    for chunk in _export_chunks(statement, batch_size):
+        yield chunk.to_csv(index=False, header=header).encode()
+        header = False
+    if header:
+        # No rows: still send the header
+        yield ",".join(column.name for column in statement.selected_columns).encode() + b"\n"
+
+class _ChunkSink:
+    """Write-only file object collecting bytes until they are taken."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.buffer += data
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+def _write_parquet(statement, batch_size: int) -> Iterator[bytes]:
+    """Write a query as a Parquet file with one row group per batch."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    def arrow_type(column_type):
+        for sql_type, arrow in ((Integer, pa.int64()), (DateTime, pa.timestamp("us")), (Date, pa.date32()), (Boolean, pa.bool_())):
+            if isinstance(column_type, sql_type):
+                return arrow
+        return pa.string()
+
+    schema = pa.schema([(column.name, arrow_type(column.type)) for column in statement.selected_columns])
+    sink = _ChunkSink()
+    with pq.ParquetWriter(pa.PythonFile(sink, mode="w"), schema) as writer:
+        for chunk in _export_chunks(statement, batch_size):
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False))
+            yield sink.take()
+    yield sink.take()
+
+def export_records(
+    entity: str,
+    file_type: str,
+    class_name: str | None = None,
+    section: str | None = None,
+    status: StudentStatus | None = None,
+    batch_size: int = EXPORT_BATCH_SIZE
+) -> Iterator[bytes]:
+    """
+    Export students or teachers as a CSV or Parquet file, produced in pieces.
+
+    Rows are read from a server-side cursor ``batch_size`` at a time, so memory
+    use does not grow with the table. On PostgreSQL, CSV is produced by the
+    server itself with COPY ... TO STDOUT.
+
+    Args:
+        entity (str): 'student' or 'teacher'
+        file_type (str): 'csv' or 'parquet'
+        class_name (str | None): Only export students of this class
+        section (str | None): Only export students of this section
+        status (StudentStatus | None): Only export students with this status
+        batch_size (int, optional): Rows per read. Defaults to EXPORT_BATCH_SIZE.
+
+    Returns:
+        Iterator[bytes]: The file's content, to be written out in order
+
+    Raises:
+        ValueError: If the entity or file type is not supported
+        ImportError: If Parquet is requested and pyarrow is not installed
+    """
+    if entity not in EXPORT_COLUMNS:
+        raise ValueError(f"Cannot export {entity!r}; choose from {', '.join(EXPORT_COLUMNS)}")
+    statement = _export_statement(entity, class_name, section, status)
+    if file_type == "csv":
+        if engine.dialect.name == "postgresql":
+            return _copy_csv(statement)
+        return _write_csv(statement, batch_size)
+    if file_type == "parquet":
+        # pyarrow is an optional dependency (the 'parquet' extra), so check for it before streaming starts
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError as e:
+            raise ImportError("Parquet exports need pyarrow; install the 'parquet' extra") from e
+        return _write_parquet(statement, batch_size)
+    raise ValueError(f"Unsupported export format {file_type!r}; choose from {', '.join(EXPORT_MEDIA_TYPES)}")
+
 def add_teacher(name: str, email: str, phone: str, department: str, subject: str) -> Teacher:
     """
     Add a new teacher to the database.
@@ -315,6 +1301,7 @@ def add_teacher(name: str, email: str, phone: str, department: str, subject: str
         session.add(teacher)
         session.commit()
         session.refresh(teacher)
+    notify_change("teacher", "insert", [teacher.id])
     return teacher
 
 def get_teacher(teacher_id: int) -> Teacher | None:
@@ -324,6 +1311,13 @@ def get_teacher(teacher_id: int) -> Teacher | None:
     with Session(engine) as session:
         return session.get(Teacher, teacher_id)
 
+def get_teachers_by_ids(teacher_ids: List[int]) -> List[Teacher]:
+    """
+    Get several teachers from the database by their IDs in a single query.
+    """
+    with Session(engine) as session:
+        return session.query(Teacher).filter(Teacher.id.in_(teacher_ids)).all()
+
 def get_all_teachers() -> list[Teacher]:
     """
     Get all teachers from the database.
@@ -331,40 +1325,59 @@ def get_all_teachers() -> list[Teacher]:
     with Session(engine) as session:
         return session.query(Teacher).all()
 
+def list_teachers(
+    columns: List[str] | None = None,
+    department: str | None = None,
+    subject: str | None = None,
+    after_id: int = 0,
+    limit: int = 50
+) -> List[dict]:
+    """
+    List teachers page by page, returning only the requested columns.
+    """
+    statement = teacher_list_statement(columns, department, subject, after_id, limit)
+    with Session(engine) as session:
+        return [dict(row) for row in session.execute(statement).mappings()]
+
+def count_teachers(group_by: List[str] | None = None) -> List[dict]:
+    """
+    Count teachers in the database, optionally per department and/or subject.
+    
+    Args:
+        group_by (List[str] | None): Columns to group by, any of department and subject.
+            Omit for a single total.
+
+    Returns:
+        List[dict]: One ``{<group columns>..., "count"}`` dict per group, largest first
+    """
+    statement = _group_count_statement(Teacher, group_by, TEACHER_GROUP_COLUMNS, [])
+    with Session(engine) as session:
+        return [dict(row) for row in session.execute(statement).mappings()]
+
 def update_teacher(teacher_id: int, name: str | None = None, email: str | None = None,
                   phone: str | None = None, department: str | None = None, 
                   subject: str | None = None) -> Teacher | None:
     """
     Update a teacher's information in the database.
     """
-    with Session(engine) as session:
-        teacher = session.get(Teacher, teacher_id)
-        if teacher:
-            if name is not None:
-                teacher.name = name
-            if email is not None:
-                teacher.email = email
-            if phone is not None:
-                teacher.phone = phone
-            if department is not None:
-                teacher.department = department
-            if subject is not None:
-                teacher.subject = subject
-            session.commit()
-            session.refresh(teacher)
-        return teacher
+    values = {"name": name, "email": email, "phone": phone, "department": department, "subject": subject}
+    with Session(engine, expire_on_commit=False) as session:
+        teacher = session.scalars(update_returning_statement(Teacher, teacher_id, values)).one_or_none()
+        session.commit()
+    if teacher:
+        notify_change("teacher", "update", [teacher.id])
+    return teacher
 
 def delete_teacher(teacher_id: int) -> bool:
     """
     Delete a teacher from the database.
     """
     with Session(engine) as session:
-        teacher = session.get(Teacher, teacher_id)
-        if teacher:
-            session.delete(teacher)
-            session.commit()
-            return True
-        return False
+        deleted = session.execute(delete(Teacher).where(Teacher.id == teacher_id).returning(Teacher.id)).first()
+        session.commit()
+    if deleted:
+        notify_change("teacher", "delete", [teacher_id])
+    return deleted is not None
 
 def add_admin(username: str, email: str, password: str) -> User:
     """
@@ -389,3 +1402,20 @@ def add_admin(username: str, email: str, password: str) -> User:
         session.commit()
         session.refresh(new_user)
     return new_user
+
+def pop_idle_chat_threads(cutoff: datetime) -> List[str]:
+    """
+    Delete the records of chat threads not used since a given time.
+
+    Args:
+        cutoff (datetime): Threads last active before this time are removed
+
+    Returns:
+        List[str]: IDs of the removed threads
+    """
+    with Session(engine) as session:
+        thread_ids = session.execute(
+            delete(ChatThread).where(ChatThread.last_active_at < cutoff).returning(ChatThread.thread_id)
+        ).scalars().all()
+        session.commit()
+        return thread_ids
@@ -1,14 +1,86 @@
 import os
+import threading
+import time
 from sqlmodel import SQLModel, create_engine
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
 from dotenv import load_dotenv
+from app.settings import (
+    DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE, DB_POOL_PRE_PING
+)
 
 # Load environment variables
 load_dotenv()
 
 DATABASE_URI = os.getenv("DATABASE_URI").replace("postgresql", "postgresql+psycopg")
 
+# SQLite is supported for local testing: no TLS, and aiosqlite (the 'sqlite' extra) as its async driver
+IS_SQLITE = DATABASE_URI.startswith("sqlite")
+ASYNC_DATABASE_URI = DATABASE_URI.replace("sqlite", "sqlite+aiosqlite", 1) if IS_SQLITE else DATABASE_URI
+connect_args = {"check_same_thread": False} if IS_SQLITE else {"sslmode": "require"}
+
+class _CheckoutTimingMixin:
+    """
+    Pool mixin recording how long callers wait to check out a connection.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except PoolTimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.wait_count += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+class TimedQueuePool(_CheckoutTimingMixin, QueuePool):
+    """QueuePool that records checkout wait times."""
+
+class TimedAsyncAdaptedQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    """AsyncAdaptedQueuePool that records checkout wait times."""
+
+pool_options = {
+    "pool_size": DB_POOL_SIZE,
+    "max_overflow": DB_MAX_OVERFLOW,
+    "pool_timeout": DB_POOL_TIMEOUT,
+    "pool_recycle": DB_POOL_RECYCLE,
+    "pool_pre_ping": DB_POOL_PRE_PING,
+}
+
 # Database engine
-engine = create_engine(DATABASE_URI, connect_args={"sslmode": "require"})
+engine = create_engine(
+    DATABASE_URI,
+    connect_args=connect_args,
+    poolclass=TimedQueuePool,
+    **pool_options
+)
+
+# Async database engine, used by the FastAPI endpoints (psycopg's async driver)
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URI,
+    connect_args={} if IS_SQLITE else connect_args,
+    poolclass=TimedAsyncAdaptedQueuePool,
+    **pool_options
+)
+
+# Objects stay loaded after commit, since lazy loads cannot run outside the session in async code
+async_session = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False)
 
 def create_tables():
     """
@@ -23,3 +95,36 @@ def create_tables():
         print("Tables created successfully")
     except Exception as e:
         raise Exception(f"Failed to create database tables: {str(e)}")
+
+
+def _describe_pool(pool: QueuePool) -> dict:
+    """
+    Summarize the state of a connection pool.
+    """
+    with pool._stats_lock:
+        wait_count, wait_total, wait_max, timeouts = (
+            pool.wait_count, pool.wait_total, pool.wait_max, pool.timeouts
+        )
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+        "max_overflow": DB_MAX_OVERFLOW,
+        "checkouts": wait_count,
+        "timeouts": timeouts,
+        "avg_wait_ms": round(wait_total / wait_count * 1000, 3) if wait_count else 0.0,
+        "max_wait_ms": round(wait_max * 1000, 3),
+    }
+
+def pool_stats() -> dict:
+    """
+    Get connection pool statistics for the sync and async engines.
+
+    Returns:
+        dict: Checked-out, idle and overflow connection counts and checkout wait times per engine
+    """
+    return {
+        "sync": _describe_pool(engine.pool),
+        "async": _describe_pool(async_engine.sync_engine.pool),
+    }
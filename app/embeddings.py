@@ -0,0 +1,69 @@
+from functools import lru_cache
+from typing import List
+from langchain_core.embeddings import Embeddings
+from app.settings import (
+    EMBEDDING_BACKEND, GOOGLE_API_KEY, GOOGLE_EMBEDDING_MODEL,
+    LOCAL_EMBEDDING_MODEL, LOCAL_EMBEDDING_BATCH_SIZE
+)
+
+class TransformersEmbeddings(Embeddings):
+    """
+    Sentence embeddings computed in process with a Hugging Face transformers
+    model: mean pooling over the token embeddings, L2-normalized.
+
+    transformers (and torch) are only imported when the first instance is
+    created, so the Google backend does not need them.
+    """
+
+    def __init__(self, model_name: str, batch_size: int):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        self._torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name)
+        self.model.eval()
+        self.batch_size = batch_size
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        torch = self._torch
+        vectors = []
+        for start in range(0, len(texts), self.batch_size):
+            batch = self.tokenizer(
+                texts[start:start + self.batch_size],
+                padding=True, truncation=True, max_length=256, return_tensors="pt"
+            )
+            with torch.inference_mode():
+                tokens = self.model(**batch).last_hidden_state
+            mask = batch["attention_mask"].unsqueeze(-1).to(tokens.dtype)
+            pooled = (tokens * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            vectors.extend(torch.nn.functional.normalize(pooled, dim=1).tolist())
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._embed(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed([text])[0]
+
+@lru_cache(maxsize=None)
+def get_embeddings(backend: str = EMBEDDING_BACKEND) -> Embeddings:
+    """
+    Get an embedding model.
+
+    The model is created on first use and shared afterwards.
+
+    Args:
+        backend (str): 'google' (Gemini embeddings API) or 'local' (a transformers
+            model run in process). Defaults to EMBEDDING_BACKEND.
+
+    Returns:
+        Embeddings: A LangChain embeddings instance
+    """
+    if backend == "google":
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        return GoogleGenerativeAIEmbeddings(model=GOOGLE_EMBEDDING_MODEL, google_api_key=GOOGLE_API_KEY)
+    if backend == "local":
+        return TransformersEmbeddings(LOCAL_EMBEDDING_MODEL, LOCAL_EMBEDDING_BATCH_SIZE)
+    raise ValueError(f"Unknown embedding backend: {backend}")
@@ -0,0 +1,30 @@
+from typing import Callable, List
+
+# Listeners called after student/teacher rows are written, as
+# listener(entity, action, ids) with entity "student" or "teacher" and action
+# "insert", "update" or "delete". Listeners run synchronously in the writer's
+# thread, so they must be quick and must not raise.
+ChangeListener = Callable[[str, str, List[int]], None]
+
+_listeners: List[ChangeListener] = []
+
+def on_change(listener: ChangeListener) -> ChangeListener:
+    """
+    Register a listener for student/teacher writes. Usable as a decorator.
+    """
+    _listeners.append(listener)
+    return listener
+
+def notify_change(entity: str, action: str, ids: List[int]) -> None:
+    """
+    Tell every registered listener that rows were written.
+
+    Args:
+        entity (str): "student" or "teacher"
+        action (str): "insert", "update" or "delete"
+        ids (List[int]): IDs of the written rows
+    """
+    if not ids:
+        return
+    for listener in _listeners:
+        listener(entity, action, ids)
@@ -0,0 +1,225 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from uuid import uuid4
+from sqlmodel import Session
+from app.crud import bulk_import_students, StudentImportResult
+from app.database import engine
+from app.models import ImportJob, ImportJobStatus, ImportMode
+from app.settings import IMPORT_JOB_STORE, IMPORT_JOB_RETENTION_SECONDS, IMPORT_WORKERS
+
+FINISHED_STATUSES = (ImportJobStatus.COMPLETED, ImportJobStatus.FAILED, ImportJobStatus.CANCELLED)
+
+class InMemoryJobStore:
+    """
+    Job store keeping import jobs in process memory.
+
+    Jobs are lost on restart and are only visible to the worker process that
+    created them, which is all that local development and tests need. Finished
+    jobs are dropped ``retention`` seconds after they finish.
+    """
+
+    def __init__(self, retention: float = IMPORT_JOB_RETENTION_SECONDS):
+        self.retention = timedelta(seconds=retention)
+        self._jobs: dict[str, ImportJob] = {}
+        self._lock = threading.Lock()
+
+    def _evict_finished(self) -> None:
+        """Drop the jobs that finished more than ``retention`` ago; the lock must be held."""
+        cutoff = datetime.utcnow() - self.retention
+        for job_id in [job_id for job_id, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def create(self, job: ImportJob) -> ImportJob:
+        """Store a new job."""
+        with self._lock:
+            self._evict_finished()
+            self._jobs[job.id] = job
+            return job.model_copy()
+
+    def get(self, job_id: str) -> ImportJob | None:
+        """Get a snapshot of a job by its ID."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job.model_copy() if job else None
+
+    def update(self, job_id: str, **values) -> ImportJob | None:
+        """Set the given fields on a job and return its new state."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            for key, value in values.items():
+                setattr(job, key, value)
+            return job.model_copy()
+
+class DatabaseJobStore:
+    """
+    Job store keeping import jobs in the ``importjob`` table.
+
+    Jobs survive restarts and can be polled from any worker process.
+    """
+
+    def create(self, job: ImportJob) -> ImportJob:
+        """Store a new job."""
+        with Session(engine) as session:
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+            return job
+
+    def get(self, job_id: str) -> ImportJob | None:
+        """Get a job by its ID."""
+        with Session(engine) as session:
+            return session.get(ImportJob, job_id)
+
+    def update(self, job_id: str, **values) -> ImportJob | None:
+        """Set the given fields on a job and return its new state."""
+        with Session(engine) as session:
+            job = session.get(ImportJob, job_id)
+            if job is None:
+                return None
+            for key, value in values.items():
+                setattr(job, key, value)
+            session.commit()
+            session.refresh(job)
+            return job
+
+def create_job_store(kind: str = IMPORT_JOB_STORE) -> InMemoryJobStore | DatabaseJobStore:
+    """
+    Create the job store selected in the settings.
+
+    Args:
+        kind (str): 'memory' or 'database'
+
+    Returns:
+        InMemoryJobStore | DatabaseJobStore: The job store
+    """
+    if kind == "database":
+        return DatabaseJobStore()
+    if kind == "memory":
+        return InMemoryJobStore()
+    raise ValueError(f"Unknown import job store: {kind}")
+
+job_store = create_job_store()
+executor = ThreadPoolExecutor(max_workers=IMPORT_WORKERS, thread_name_prefix="import")
+
+def _run_import(job_id: str, path: str, file_type: str, mode: ImportMode) -> None:
+    """
+    Run an import job on a worker thread and record its progress in the job store.
+
+    The reported errors are only written again when a chunk added some, and
+    the import keeps at most IMPORT_MAX_REPORTED_ERRORS of them.
+    """
+    reported = 0
+
+    def progress(result: StudentImportResult) -> bool:
+        nonlocal reported
+        values = {}
+        if len(result.errors) > reported:
+            reported = len(result.errors)
+            values["errors"] = list(result.errors)
+        job = job_store.update(
+            job_id,
+            rows_processed=result.rows_processed,
+            inserted=result.inserted,
+            updated=result.updated,
+            unchanged=result.unchanged,
+            **values
+        )
+        return not job.cancel_requested
+
+    try:
+        job = job_store.get(job_id)
+        if job is None or job.cancel_requested:
+            job_store.update(job_id, status=ImportJobStatus.CANCELLED, finished_at=datetime.utcnow())
+            return
+        job_store.update(job_id, status=ImportJobStatus.RUNNING, started_at=datetime.utcnow())
+        result = bulk_import_students(path, file_type, mode, progress=progress)
+        job_store.update(
+            job_id,
+            status=ImportJobStatus.CANCELLED if result.cancelled else ImportJobStatus.COMPLETED,
+            finished_at=datetime.utcnow()
+        )
+    except Exception as e:
+        job_store.update(
+            job_id,
+            status=ImportJobStatus.FAILED,
+            detail=str(getattr(e, "detail", e)),
+            finished_at=datetime.utcnow()
+        )
+    finally:
+        os.remove(path)
+
+def submit_import(path: str, filename: str, file_type: str, mode: ImportMode) -> ImportJob:
+    """
+    Queue a student import on the worker pool.
+
+    Args:
+        path (str): Path of the spooled upload; removed once the job finishes
+        filename (str): Original name of the uploaded file
+        file_type (str): Type of file ('csv', 'xlsx' or 'xls')
+        mode (ImportMode): Import mode
+
+    Returns:
+        ImportJob: The queued job
+    """
+    job = job_store.create(ImportJob(id=uuid4().hex, filename=filename, mode=mode))
+    executor.submit(_run_import, job.id, path, file_type, mode)
+    return job
+
+def cancel_import(job_id: str) -> ImportJob | None:
+    """
+    Request cancellation of an import job.
+
+    A queued job is cancelled as soon as a worker picks it up; a running job
+    stops after the chunk it is currently writing, keeping the rows already
+    committed.
+
+    Args:
+        job_id (str): The ID of the job
+
+    Returns:
+        ImportJob | None: The job's state if found, None otherwise
+    """
+    job = job_store.get(job_id)
+    if job is None or job.status in FINISHED_STATUSES:
+        return job
+    return job_store.update(job_id, cancel_requested=True)
+
+def describe_job(job: ImportJob) -> dict:
+    """
+    Summarize an import job for API responses.
+
+    Args:
+        job (ImportJob): The job
+
+    Returns:
+        dict: Job state including throughput in rows per second
+    """
+    rows_per_second = 0.0
+    if job.started_at is not None:
+        elapsed = ((job.finished_at or datetime.utcnow()) - job.started_at).total_seconds()
+        if elapsed > 0:
+            rows_per_second = round(job.rows_processed / elapsed, 1)
+    return {
+        "job_id": job.id,
+        "filename": job.filename,
+        "mode": job.mode,
+        "status": job.status,
+        "rows_processed": job.rows_processed,
+        "rows_per_second": rows_per_second,
+        "inserted": job.inserted,
+        "updated": job.updated,
+        "unchanged": job.unchanged,
+        # Every processed row is written, left unchanged or rejected
+        "rejected": job.rows_processed - job.inserted - job.updated - job.unchanged,
+        "errors": job.errors,
+        "detail": job.detail,
+        "cancel_requested": job.cancel_requested,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at
+    }
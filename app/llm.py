@@ -1,28 +1,95 @@
+import asyncio
+import json
 import os
+import time
+from collections import defaultdict
+from uuid import uuid4
 from langchain_google_genai import ChatGoogleGenerativeAI
-from langgraph.checkpoint.memory import MemorySaver
-from langgraph.prebuilt import tools_condition, ToolNode
-from langgraph.graph import MessagesState, StateGraph, START, END
-from app.settings import GOOGLE_API_KEY
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.tools import StructuredTool
+from langgraph.prebuilt import tools_condition
+from langgraph.prebuilt.tool_node import msg_content_output
+from langgraph.graph import StateGraph, START, END
+from langchain_core.runnables import RunnableConfig
+from app import async_crud
+from app.settings import GOOGLE_API_KEY, TOOL_CONCURRENCY, VECTOR_INDEX_ENABLED
+from app.checkpoint import build_checkpointer
+from app.context import AgentState, build_prompt
 from app.crud import (
     add_student, get_student, get_all_students, update_student, delete_student,
     search_student_by_roll_no, search_students_by_class_section,
     search_students_by_status, add_teacher, get_teacher, get_all_teachers,
-    update_teacher, delete_teacher, add_admin
+    update_teacher, delete_teacher, count_students, top_student_groups,
+    list_students, count_teachers, search_students_by_name, semantic_search,
+    update_students_where, delete_students_where
 )
 from app.models import UserRole
+from app.router import match_intent, format_answer, router_metrics
 
 # Initialize LLM
 llm = ChatGoogleGenerativeAI(model="gemini-1.5-flash", google_api_key=GOOGLE_API_KEY)
 
+def as_tool(func) -> StructuredTool:
+    """
+    Wrap a CRUD function as a tool.
+
+    The schema comes from the app.crud function; the graph awaits its
+    app.async_crud counterpart of the same name.
+    """
+    return StructuredTool.from_function(
+        func=func,
+        coroutine=getattr(async_crud, func.__name__),
+        parse_docstring=True,
+        error_on_invalid_docstring=False
+    )
+
 # Configure available tools
-tools = [
+tools = [as_tool(func) for func in [
     add_student, get_student, get_all_students, update_student, delete_student,
     search_student_by_roll_no, search_students_by_class_section, search_students_by_status,
-    add_teacher, get_teacher, get_all_teachers, update_teacher, delete_teacher
-]
+    add_teacher, get_teacher, get_all_teachers, update_teacher, delete_teacher,
+    count_students, top_student_groups, list_students, count_teachers,
+    search_students_by_name, update_students_where, delete_students_where
+] + ([semantic_search] if VECTOR_INDEX_ENABLED else [])]
+tools_by_name = {tool.name: tool for tool in tools}
+
+# Tools that never write, whose answers may be served from the semantic cache
+read_only_tools = {
+    tool.__name__ for tool in [
+        get_student, get_all_students, search_student_by_roll_no,
+        search_students_by_class_section, search_students_by_status,
+        get_teacher, get_all_teachers, count_students, top_student_groups,
+        list_students, count_teachers, search_students_by_name, semantic_search
+    ]
+}
+
+# Tools each role may use. Only these are bound to the role's model, so their
+# schemas are the only ones sent with its prompts, and the tools node refuses
+# calls to any other tool.
+role_tool_names = {
+    UserRole.ADMIN: set(tools_by_name),
+    UserRole.TEACHER: {
+        "get_student", "get_all_students", "search_student_by_roll_no",
+        "search_students_by_class_section", "search_students_by_status", "get_teacher",
+        "count_students", "top_student_groups", "list_students", "count_teachers",
+        "search_students_by_name", "semantic_search"
+    },
+    UserRole.STUDENT: {"get_student", "search_student_by_roll_no"}
+}
+role_tools = {role: [tool for tool in tools if tool.name in names] for role, names in role_tool_names.items()}
+
+# One pre-bound model per role, built once at startup
+llm_by_role = {role: llm.bind_tools(role_tool_list) for role, role_tool_list in role_tools.items()}
 
-llm_with_tools = llm.bind_tools(tools)
+# Tools whose calls in one turn are answered by a single query:
+# tool name -> (function taking a list of IDs, name of the ID argument)
+batched_tools = {
+    "get_student": (async_crud.get_students_by_ids, "student_id"),
+    "get_teacher": (async_crud.get_teachers_by_ids, "teacher_id")
+}
+
+# Caps the tool calls running at once, each of which holds a database connection
+tool_semaphore = asyncio.Semaphore(TOOL_CONCURRENCY)
 
 def get_role_specific_system_message(user_role: UserRole) -> str:
     """Get role-specific system message."""
@@ -52,9 +119,39 @@ def get_role_specific_system_message(user_role: UserRole) -> str:
         - Update your contact information , view you class Schedule
         """
 
-def assistant(state: MessagesState):
+async def router(state: AgentState, config: RunnableConfig):
+    """
+    Answer simple lookups by calling the matching CRUD function directly.
+
+    The call is recorded as a regular tool call and result, followed by the
+    answer, so routed turns look the same as model-handled ones in the history.
+    """
+    started = time.perf_counter()
+    user_role = config["configurable"].get("user_role", UserRole.STUDENT)
+    query = state["messages"][-1].content
+    intent = match_intent(query, role_tool_names[user_role]) if isinstance(query, str) else None
+    if intent is None:
+        router_metrics.record_llm()
+        return {"messages": []}
+
+    tool, arguments = intent
+    call_id = f"route-{uuid4().hex}"
+    result = await tool(**arguments)
+    messages = [
+        AIMessage(content="", tool_calls=[{"name": tool.__name__, "args": arguments, "id": call_id}]),
+        ToolMessage(content=msg_content_output(result), name=tool.__name__, tool_call_id=call_id),
+        AIMessage(content=format_answer(result))
+    ]
+    router_metrics.record_routed(time.perf_counter() - started)
+    return {"messages": messages}
+
+def route_after_router(state: AgentState) -> str:
+    """Finish if the router answered, otherwise hand the query to the model."""
+    return END if isinstance(state["messages"][-1], AIMessage) else "assistant"
+
+async def assistant(state: AgentState, config: RunnableConfig):
     """Process messages based on user role."""
-    user_role = state.get("configurable", {}).get("user_role", UserRole.STUDENT)
+    user_role = config["configurable"].get("user_role", UserRole.STUDENT)
     system_message = get_role_specific_system_message(user_role)
     
     # Check for admin addition command
@@ -63,24 +160,102 @@ def assistant(state: MessagesState):
         if "add admin" in state["messages"][-1]:
             _, _, username, email, password = state["messages"][-1].split()
             try:
-                new_admin = add_admin(username, email, password)
+                new_admin = await async_crud.add_admin(username, email, password)
                 return {"messages": [f"Admin {new_admin.username} added successfully."]}
             except Exception as e:
                 return {"messages": [f"Error adding admin: {str(e)}"]}
     
-    return {"messages": [llm_with_tools.invoke([system_message] + state["messages"][-10:])]}
+    prompt, updates = await build_prompt(state, system_message, llm)
+    updates["messages"].append(await llm_by_role[user_role].ainvoke(prompt))
+    return updates
+
+def tool_content(result) -> str:
+    """Serialize a tool result; rows from the aggregate and listing tools become JSON."""
+    rows = result if isinstance(result, list) else [result]
+    if isinstance(result, (list, dict)) and all(isinstance(row, dict) for row in rows):
+        return json.dumps(result, default=str, ensure_ascii=False)
+    return msg_content_output(result)
+
+def _tool_error(call: dict, error: str) -> ToolMessage:
+    return ToolMessage(
+        content=f"Error: {error}\n Please fix your mistakes.",
+        name=call["name"],
+        tool_call_id=call["id"],
+        status="error"
+    )
+
+async def _run_tool(call: dict, config: RunnableConfig) -> list[ToolMessage]:
+    """Run one tool call."""
+    async with tool_semaphore:
+        try:
+            result = await tools_by_name[call["name"]].ainvoke(call["args"], config)
+        except Exception as e:
+            return [_tool_error(call, repr(e))]
+    return [ToolMessage(content=tool_content(result), name=call["name"], tool_call_id=call["id"])]
+
+async def _run_batch(name: str, calls: list[dict]) -> list[ToolMessage]:
+    """Answer several calls of a batched tool with one query."""
+    fetch, id_argument = batched_tools[name]
+    messages, ids = [], {}
+    for call in calls:
+        try:
+            ids[call["id"]] = int(call["args"][id_argument])
+        except (KeyError, TypeError, ValueError) as e:
+            messages.append(_tool_error(call, repr(e)))
+    if not ids:
+        return messages
+    async with tool_semaphore:
+        try:
+            records = {record.id: record for record in await fetch(list(set(ids.values())))}
+        except Exception as e:
+            return messages + [_tool_error(call, repr(e)) for call in calls if call["id"] in ids]
+    return messages + [
+        ToolMessage(content=msg_content_output(records.get(ids[call["id"]])), name=name, tool_call_id=call["id"])
+        for call in calls if call["id"] in ids
+    ]
+
+async def run_tools(state: AgentState, config: RunnableConfig):
+    """
+    Run the tool calls of the latest assistant message.
+
+    Calls to tools outside the user's role are refused. Several calls of a
+    batched tool are answered by one query, and the calls are otherwise run
+    concurrently, at most TOOL_CONCURRENCY at a time.
+    """
+    user_role = config["configurable"].get("user_role", UserRole.STUDENT)
+    allowed = role_tool_names[user_role]
+    calls = state["messages"][-1].tool_calls
+
+    results: dict[str, ToolMessage] = {}
+    pending, batches = [], defaultdict(list)
+    for call in calls:
+        if call["name"] not in allowed:
+            results[call["id"]] = _tool_error(call, f"{call['name']} is not available to your role.")
+        elif call["name"] in batched_tools:
+            batches[call["name"]].append(call)
+        else:
+            pending.append(_run_tool(call, config))
+    for name, batch in batches.items():
+        pending.append(_run_tool(batch[0], config) if len(batch) == 1 else _run_batch(name, batch))
+
+    for messages in await asyncio.gather(*pending):
+        results.update((message.tool_call_id, message) for message in messages)
+    # Answer in the order the calls were made
+    return {"messages": [results[call["id"]] for call in calls]}
 
 # Configure the graph
-builder = StateGraph(MessagesState)
+builder = StateGraph(AgentState)
+builder.add_node("router", router)
 builder.add_node("assistant", assistant)
-builder.add_node("tools", ToolNode(tools))
+builder.add_node("tools", run_tools)
 
-builder.add_edge(START, "assistant")
+builder.add_edge(START, "router")
+builder.add_conditional_edges("router", route_after_router, ["assistant", END])
 builder.add_conditional_edges("assistant", tools_condition)
 builder.add_edge("tools", "assistant")
 
-# Set up memory
-memory = MemorySaver()
+# Set up memory (per-thread conversation checkpoints, backend chosen in settings)
+memory = build_checkpointer()
 
 # Build the agent
 agent = builder.compile(checkpointer=memory)
@@ -1,24 +1,48 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Depends, Request, status
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, Depends, Query, Request, Body, status
 from fastapi.security import OAuth2PasswordRequestForm
-from fastapi.responses import RedirectResponse
-from sqlmodel import Session
-from datetime import timedelta
-from app.database import create_tables, engine
-from app.models import User, UserRole
+from fastapi.responses import RedirectResponse, StreamingResponse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from app.database import create_tables, pool_stats
+from app.migrations import migrate_indexes
+from app.models import User, UserRole, ImportMode, StudentStatus, UserPage, RowPage
 from app.auth import (
-    ACCESS_TOKEN_EXPIRE_MINUTES, create_access_token,
     get_current_user, check_admin_access, check_teacher_access,
-    verify_password, oauth, get_password_hash
+    oauth, get_oauth_user, get_password_hash_async, verify_and_update_password_async,
+    user_cache, invalidate_user, create_token_pair, refresh_access_token,
+    hash_refresh_token
 )
 from app.crud import (
     add_student, get_student, get_all_students,
-    update_student, delete_student, bulk_import_students
+    update_student, delete_student, student_list_statement,
+    teacher_list_statement, user_list_statement, MAX_PAGE_SIZE,
+    export_records, EXPORT_MEDIA_TYPES, student_cache
 )
-from app.llm import agent
+from app.async_crud import (
+    create_user, get_user_by_username, get_user_by_username_or_email,
+    list_users, list_students, list_teachers, stream_rows,
+    update_students_where, delete_students_where,
+    update_user, update_user_password, revoke_refresh_token, touch_chat_thread
+)
+from app.jobs import job_store, submit_import, cancel_import, describe_job
+from app.llm import agent, memory, read_only_tools, role_tool_names
+from app.checkpoint import thread_id_for, prune_checkpoints_periodically
+from app.semantic_cache import semantic_cache, cacheable_answer, current_turn
+from app.context import context_metrics, SUMMARY_TAG
+from app.router import router_metrics, match_intent
+from langchain_core.messages import AIMessage, HumanMessage
+from app.settings import UPLOAD_SPOOL_CHUNK_BYTES, VECTOR_INDEX_ENABLED
+from app.vector_index import vector_index_updater
 from sqlalchemy import Column, Integer, ForeignKey
 from sqlalchemy.orm import relationship
 from sqlmodel import SQLModel, Field
-from typing import Optional
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="AI College Management System",
@@ -27,12 +51,19 @@ app = FastAPI(
 )
 
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     """
-    Initialize the application by creating database tables.
+    Initialize the application by creating database tables, adding missing
+    indexes and loading the vector indexes in the background and starting the
+    periodic pruning of idle conversation threads.
     This function is called when the application starts.
     """
     create_tables()
+    # Index builds can take a while on large tables, so they do not delay startup
+    app.state.index_migration = asyncio.create_task(asyncio.to_thread(migrate_indexes))
+    if VECTOR_INDEX_ENABLED:
+        vector_index_updater.start()
+    app.state.checkpoint_pruner = asyncio.create_task(prune_checkpoints_periodically(memory))
 
 @app.get('/')
 def index():
@@ -44,19 +75,43 @@ def index():
     """
     return {"message": "Welcome to My AI Based College Management System(Agent)"}
 
-@app.post("/upload-students/")
-async def upload_students(file: UploadFile = File(...)):
+async def spool_upload(file: UploadFile) -> str:
+    """
+    Copy an uploaded file to a temporary file on disk in bounded chunks.
+
+    Args:
+        file (UploadFile): The uploaded file
+
+    Returns:
+        str: Path of the temporary file; the caller is responsible for removing it
+    """
+    suffix = os.path.splitext(file.filename)[1]
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as spool:
+        try:
+            while chunk := await file.read(UPLOAD_SPOOL_CHUNK_BYTES):
+                # Disk writes would block the event loop
+                await asyncio.to_thread(spool.write, chunk)
+        except BaseException:
+            spool.close()
+            os.remove(spool.name)
+            raise
+    return spool.name
+
+@app.post("/upload-students/", status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(check_admin_access)])
+async def upload_students(file: UploadFile = File(...), mode: ImportMode = ImportMode.INSERT):
     """
-    Upload and process a student data file.
+    Upload a student data file and queue it for import.
     
     Args:
         file (UploadFile): CSV or Excel file containing student data
+        mode (ImportMode, optional): 'insert' to add new students only, or 'upsert'
+            to insert new and update changed students keyed on roll_no
 
     Returns:
-        dict: Import results including success message and imported students
+        dict: The import job ID and status, to be polled at /imports/{job_id}
 
     Raises:
-        HTTPException: If file format is invalid or processing fails
+        HTTPException: If file format is invalid
     """
     # Check if the uploaded file has a valid format
     if not file.filename.endswith(('.csv', '.xlsx', '.xls')):
@@ -65,19 +120,87 @@ async def upload_students(file: UploadFile = File(...)):
             detail="Only CSV and Excel files are supported"
         )
     
-    content = await file.read()
-    file_type = 'csv' if file.filename.endswith('.csv') else 'excel'
-    
+    file_type = file.filename.rsplit('.', 1)[-1]
+    path = await spool_upload(file)
     try:
-        # Process the file and import students
-        students = bulk_import_students(content, file_type)
-        return {
-            "message": f"Successfully imported {len(students)} students",
-            "students": [{"id": s.id, "roll_no": s.roll_no, "name": s.name} for s in students]
-        }
-    except Exception as e:
-        # Handle any errors during the import process
+        job = submit_import(path, file.filename, file_type, mode)
+    except BaseException:
+        # Once submitted, the job removes the file
+        os.remove(path)
+        raise
+    return {"message": "Import queued", "job_id": job.id, "status": job.status}
+
+@app.get("/imports/{job_id}", dependencies=[Depends(check_admin_access)])
+async def get_import_job(job_id: str):
+    """
+    Get the progress of a student import job.
+
+    Args:
+        job_id (str): The ID of the import job
+
+    Returns:
+        dict: Rows processed, rows per second, counts, rejected rows and status
+
+    Raises:
+        HTTPException: If the job does not exist
+    """
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return describe_job(job)
+
+@app.delete("/imports/{job_id}", dependencies=[Depends(check_admin_access)])
+async def cancel_import_job(job_id: str):
+    """
+    Cancel a queued or running student import job.
+
+    Args:
+        job_id (str): The ID of the import job
+
+    Returns:
+        dict: The job's state after the cancellation request
+
+    Raises:
+        HTTPException: If the job does not exist
+    """
+    job = cancel_import(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return describe_job(job)
+
+@app.get("/export/{entity}", dependencies=[Depends(check_admin_access)])
+def export_entity(
+    entity: str,
+    file_type: str = "csv",
+    class_name: str | None = None,
+    section: str | None = None,
+    student_status: StudentStatus | None = Query(None, alias="status")
+):
+    """
+    Download all students or teachers as a CSV or Parquet file.
+
+    Args:
+        entity (str): 'student' or 'teacher'
+        file_type (str): 'csv' or 'parquet'
+        class_name (str | None): Only export students of this class
+        section (str | None): Only export students of this section
+        student_status (StudentStatus | None): Only export students with this status
+
+    Returns:
+        StreamingResponse: The file, streamed as it is read from the database
+
+    Raises:
+        HTTPException: If the entity or file type is not supported
+    """
+    try:
+        content = export_records(entity, file_type, class_name, section, student_status)
+    except (ValueError, ImportError) as e:
         raise HTTPException(status_code=400, detail=str(e))
+    return StreamingResponse(
+        content,
+        media_type=EXPORT_MEDIA_TYPES[file_type],
+        headers={"Content-Disposition": f'attachment; filename="{entity}s.{file_type}"'}
+    )
 
 @app.post("/register")
 async def register(username: str, email: str, password: str, role: UserRole):
@@ -89,47 +212,56 @@ async def register(username: str, email: str, password: str, role: UserRole):
             detail="Invalid role. Must be 'admin', 'teacher', or 'student'."
         )
 
-    with Session(engine) as session:
-        # Check if the user already exists
-        existing_user = session.query(User).filter((User.username == username) | (User.email == email)).first()
-        if existing_user:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Username or email already registered try with other username or email"
-            )
-        
-        # Create new user
-        new_user = User(
-            username=username,
-            email=email,
-            hashed_password=get_password_hash(password),
-            role=role  # Set the role based on user input
+    # Check if the user already exists
+    existing_user = await get_user_by_username_or_email(username, email)
+    if existing_user:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Username or email already registered try with other username or email"
         )
-        session.add(new_user)
-        session.commit()
-        session.refresh(new_user)
-        
-        return {"message": "User registered successfully", "user_id": new_user.id}
+    
+    # Create new user
+    new_user = await create_user(User(
+        username=username,
+        email=email,
+        hashed_password=await get_password_hash_async(password),
+        role=role  # Set the role based on user input
+    ))
+    
+    return {"message": "User registered successfully", "user_id": new_user.id}
 
 @app.post("/token")
 async def login(form_data: OAuth2PasswordRequestForm = Depends()):
     """Login endpoint for username/password authentication."""
-    with Session(engine) as session:
-        # Retrieve user by username
-        user = session.query(User).filter(User.username == form_data.username).first()
-        if not user or not verify_password(form_data.password, user.hashed_password):
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Incorrect username or password",
-                headers={"WWW-Authenticate": "Bearer"},
-            )
-        
-        # Create access token for the user
-        access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = create_access_token(
-            data={"sub": user.username}, expires_delta=access_token_expires
+    # Retrieve user by username
+    user = await get_user_by_username(form_data.username)
+    if user:
+        valid, new_hash = await verify_and_update_password_async(form_data.password, user.hashed_password)
+    if not user or not valid:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+            headers={"WWW-Authenticate": "Bearer"},
         )
-        return {"access_token": access_token, "token_type": "bearer"}
+    
+    # Store a fresh hash if the bcrypt cost has changed since this one was made
+    if new_hash:
+        await update_user_password(user.id, new_hash)
+        invalidate_user(user.username)
+    
+    # Create access and refresh tokens for the user
+    return await create_token_pair(user)
+
+@app.post("/token/refresh")
+async def refresh_token(refresh_token: str = Form(...)):
+    """Exchange a refresh token for a new access token and a rotated refresh token."""
+    return await refresh_access_token(refresh_token)
+
+@app.post("/token/revoke")
+async def revoke_token(refresh_token: str = Form(...)):
+    """Revoke a refresh token, e.g. on logout."""
+    await revoke_refresh_token(hash_refresh_token(refresh_token))
+    return {"message": "Refresh token revoked"}
 
 @app.get('/login/google')
 async def google_login(request: Request):
@@ -143,12 +275,8 @@ async def auth_callback(request: Request):
     token = await oauth.google.authorize_access_token(request)
     user = await get_oauth_user("google", token)
     if user:
-        # Create access token for the authenticated user
-        access_token = create_access_token(
-            data={"sub": user.username},
-            expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        )
-        return {"access_token": access_token, "token_type": "bearer"}
+        # Create access and refresh tokens for the authenticated user
+        return await create_token_pair(user)
     raise HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate OAuth credentials",
@@ -159,32 +287,296 @@ async def read_users_me(current_user: User = Depends(get_current_user)):
     """Get current user information."""
     return current_user
 
+async def lookup_cached_answer(query: str, role: UserRole, config: dict) -> tuple[str | None, Any, int]:
+    """
+    Look a chat query up in the semantic cache.
+
+    Only the first turn of a thread is looked up, and later stored: the
+    cache key is the query alone, while a follow-up's meaning depends on the
+    earlier turns. Queries the router answers directly skip the cache too, as
+    they are cheaper than an embedding lookup.
+
+    Returns:
+        tuple: The cached answer or None, the query embedding to store the
+            agent's answer under (None if it must not be stored), and the cache
+            generation before the agent runs
+    """
+    if semantic_cache is None or match_intent(query, role_tool_names[role]) is not None:
+        return None, None, 0
+    if (await agent.aget_state(config)).values.get("messages"):
+        return None, None, 0
+    # A cache failure (e.g. the embedding API is down) must not fail the chat
+    try:
+        generation = semantic_cache.generation
+        vector = await semantic_cache.embed(query)
+        return semantic_cache.lookup(role, vector), vector, generation
+    except Exception:
+        logger.exception("Semantic cache lookup failed")
+        return None, None, 0
+
+async def record_cached_exchange(config: dict, query: str, answer: str) -> list:
+    """Add a cached answer and its question to the thread, as if the agent had answered."""
+    messages = [HumanMessage(content=query), AIMessage(content=answer)]
+    # As the router's output, the graph ends the turn there
+    await agent.aupdate_state(config, {"messages": messages}, as_node="router")
+    return messages
+
 @app.get("/chat/{query}")
 async def get_chat_response(
     query: str,
+    session_id: str = "default",
     current_user: User = Depends(get_current_user)
 ):
-    """Process chat query with AI agent."""
+    """
+    Process chat query with AI agent.
+
+    Each user gets their own conversation per ``session_id``.
+    """
     try:
+        started = time.perf_counter()
+        thread_id = thread_id_for(current_user, session_id)
         config = {
             "configurable": {
-                "thread_id": "2",
+                "thread_id": thread_id,
                 "user_role": current_user.role
             }
         }
+        answer, vector, generation = await lookup_cached_answer(query, current_user.role, config)
+        await touch_chat_thread(thread_id, current_user.id)
+        if answer is not None:
+            messages = await record_cached_exchange(config, query, answer)
+            return {"messages": messages, "cached": True}
+
         # Invoke the AI agent with the user's query
-        result = agent.invoke({"messages": [("user", query)]}, config)
+        result = await agent.ainvoke({"messages": [("user", query)]}, config)
+
+        if vector is not None:
+            answer = cacheable_answer(result["messages"], read_only_tools)
+            if answer is not None:
+                semantic_cache.store(current_user.role, vector, answer, time.perf_counter() - started, generation)
         return result
     except Exception as e:
         # Handle any errors during the chat processing
         return {"error": str(e)}
 
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+def compact_chat_result(messages: list) -> dict:
+    """Summarize the latest agent turn as its answer and the tools it called."""
+    turn = current_turn(messages)
+    answer = turn[-1].content if turn and isinstance(turn[-1], AIMessage) else ""
+    tool_calls = [
+        call["name"] for message in turn if isinstance(message, AIMessage) for call in message.tool_calls
+    ]
+    return {"answer": answer, "tool_calls": tool_calls}
+
+@app.get("/chat/stream/{query}")
+async def stream_chat_response(
+    query: str,
+    session_id: str = "default",
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Process chat query with AI agent, streaming progress as Server-Sent Events.
+
+    Emits ``token`` events with model output as it is generated, ``tool_start``
+    and ``tool_end`` events around tool calls, and a final ``result`` event with
+    the answer, the tools called and the prompt size statistics (instead of the
+    whole conversation state).
+    Each user gets their own conversation per ``session_id``.
+    """
+    thread_id = thread_id_for(current_user, session_id)
+    config = {
+        "configurable": {
+            "thread_id": thread_id,
+            "user_role": current_user.role
+        }
+    }
+
+    async def events():
+        try:
+            started = time.perf_counter()
+            answer, vector, generation = await lookup_cached_answer(query, current_user.role, config)
+            await touch_chat_thread(thread_id, current_user.id)
+            if answer is not None:
+                await record_cached_exchange(config, query, answer)
+                yield sse_event("result", {"answer": answer, "tool_calls": [], "cached": True})
+                return
+
+            async for event in agent.astream_events({"messages": [("user", query)]}, config, version="v2"):
+                kind = event["event"]
+                if SUMMARY_TAG in event.get("tags", []):
+                    continue
+                if kind == "on_chat_model_stream":
+                    content = event["data"]["chunk"].content
+                    if isinstance(content, str) and content:
+                        yield sse_event("token", {"text": content})
+                elif kind == "on_tool_start":
+                    yield sse_event("tool_start", {"name": event["name"], "input": event["data"].get("input")})
+                elif kind == "on_tool_end":
+                    yield sse_event("tool_end", {"name": event["name"]})
+
+            values = (await agent.aget_state(config)).values
+            messages = values["messages"]
+            if vector is not None:
+                answer = cacheable_answer(messages, read_only_tools)
+                if answer is not None:
+                    semantic_cache.store(current_user.role, vector, answer, time.perf_counter() - started, generation)
+            yield sse_event("result", {
+                **compact_chat_result(messages),
+                "context": values.get("context_stats"),
+                "cached": False
+            })
+        except Exception as e:
+            # Handle any errors during the chat processing
+            yield sse_event("error", {"error": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def parse_fields(fields: str | None) -> list[str] | None:
+    """Split a comma-separated ``fields`` query parameter into column names."""
+    if not fields:
+        return None
+    return [name.strip() for name in fields.split(",") if name.strip()]
+
+def ndjson_response(statement) -> StreamingResponse:
+    """Stream the rows of a query as newline-delimited JSON."""
+    async def lines():
+        async for row in stream_rows(statement):
+            yield json.dumps(row, default=str) + "\n"
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+def next_cursor(rows: list[dict], limit: int) -> int | None:
+    """The ``after_id`` of the next page, or None on the last page."""
+    return rows[-1]["id"] if len(rows) == limit else None
+
+@app.get("/students", dependencies=[Depends(check_teacher_access)], response_model=RowPage)
+async def get_students_page(
+    fields: str | None = None,
+    class_name: str | None = None,
+    section: str | None = None,
+    student_status: StudentStatus | None = Query(None, alias="status"),
+    after_id: int = 0,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    ndjson: bool = False
+):
+    """
+    List students in pages ordered by ID.
+
+    ``fields`` is a comma-separated list of columns to return. With
+    ``ndjson=true`` every matching student after ``after_id`` is streamed
+    as one JSON object per line, ignoring ``limit``.
+    """
+    columns = parse_fields(fields)
+    try:
+        if ndjson:
+            return ndjson_response(student_list_statement(columns, class_name, section, student_status, after_id))
+        rows = await list_students(columns, class_name, section, student_status, after_id, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return RowPage(items=rows, next_after_id=next_cursor(rows, limit))
+
+@app.get("/teachers", dependencies=[Depends(check_teacher_access)], response_model=RowPage)
+async def get_teachers_page(
+    fields: str | None = None,
+    department: str | None = None,
+    subject: str | None = None,
+    after_id: int = 0,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    ndjson: bool = False
+):
+    """
+    List teachers in pages ordered by ID, like /students.
+    """
+    columns = parse_fields(fields)
+    try:
+        if ndjson:
+            return ndjson_response(teacher_list_statement(columns, department, subject, after_id))
+        rows = await list_teachers(columns, department, subject, after_id, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return RowPage(items=rows, next_after_id=next_cursor(rows, limit))
+
 # Protected admin routes
-@app.get("/admin/users", dependencies=[Depends(check_admin_access)])
-async def get_all_users():
-    """Admin endpoint to get all users."""
-    with Session(engine) as session:
-        return session.query(User).all()
+@app.get("/admin/users", dependencies=[Depends(check_admin_access)], response_model=UserPage)
+async def get_all_users(
+    role: UserRole | None = None,
+    is_active: bool | None = None,
+    after_id: int = 0,
+    limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+    ndjson: bool = False
+):
+    """
+    Admin endpoint to list users in pages ordered by ID, without password hashes.
+
+    With ``ndjson=true`` every matching user after ``after_id`` is streamed as
+    one JSON object per line.
+    """
+    if ndjson:
+        return ndjson_response(user_list_statement(role, is_active, after_id))
+    rows = await list_users(role, is_active, after_id, limit)
+    return UserPage(items=rows, next_after_id=next_cursor(rows, limit))
+
+@app.patch("/admin/users/{user_id}", dependencies=[Depends(check_admin_access)])
+async def update_user_access(user_id: int, role: UserRole | None = None, is_active: bool | None = None):
+    """Admin endpoint to change a user's role or deactivate them."""
+    user = await update_user(user_id, role=role, is_active=is_active)
+    if user is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    invalidate_user(user.username)
+    return {"message": "User updated successfully", "user_id": user.id, "role": user.role, "is_active": user.is_active}
+
+@app.patch("/admin/students", dependencies=[Depends(check_admin_access)])
+async def update_students_bulk(
+    values: dict = Body(..., examples=[{"current_status": "graduated"}]),
+    class_name: str | None = None,
+    section: str | None = None,
+    student_status: StudentStatus | None = Query(None, alias="status"),
+    student_ids: list[int] | None = Query(None)
+):
+    """
+    Admin endpoint to update every student matching the filters in one statement.
+
+    The body holds the columns to set, e.g. ``{"class_name": "10"}``.
+    At least one filter is required.
+    """
+    try:
+        rows = await update_students_where(values, class_name, section, student_status, student_ids)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {"updated": len(rows), "items": rows}
+
+@app.delete("/admin/students", dependencies=[Depends(check_admin_access)])
+async def delete_students_bulk(
+    class_name: str | None = None,
+    section: str | None = None,
+    student_status: StudentStatus | None = Query(None, alias="status"),
+    student_ids: list[int] | None = Query(None)
+):
+    """Admin endpoint to delete every student matching the filters in one statement."""
+    try:
+        rows = await delete_students_where(class_name, section, student_status, student_ids)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {"deleted": len(rows), "items": rows}
+
+@app.get("/internal/stats", dependencies=[Depends(check_admin_access)])
+async def get_internal_stats():
+    """Admin endpoint exposing runtime statistics for capacity tuning."""
+    return {
+        "db_pool": pool_stats(),
+        "user_cache": user_cache.stats(),
+        "student_cache": student_cache.stats(),
+        "semantic_cache": semantic_cache.stats() if semantic_cache is not None else {"enabled": False},
+        "chat_context": context_metrics.stats(),
+        "chat_router": router_metrics.stats()
+    }
 
 # Protected teacher routes
 @app.get("/teacher/students", dependencies=[Depends(check_teacher_access)])
@@ -0,0 +1,141 @@
+import logging
+from sqlalchemy import inspect, select, text
+from sqlalchemy.schema import CreateIndex
+from sqlmodel import SQLModel
+from app.crud import _status_filter, _trigram_name_search_statement
+from app.database import engine
+from app.models import Student, StudentStatus
+
+logger = logging.getLogger(__name__)
+
+def _create_index_sql(index) -> str:
+    """CREATE INDEX IF NOT EXISTS for an index, built concurrently on PostgreSQL."""
+    sql = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+    if engine.dialect.name == "postgresql":
+        # Concurrent builds do not block writes to the table
+        sql = sql.replace("INDEX", "INDEX CONCURRENTLY", 1)
+    return sql
+
+# Indexes that cannot be declared on the models because they need an extension
+TRIGRAM_INDEXES = {
+    "ix_student_name_trgm": "CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_student_name_trgm "
+                            "ON student USING gin (name gin_trgm_ops)"
+}
+
+def migrate_indexes() -> list[str]:
+    """
+    Add the indexes declared on the models that existing tables are missing.
+
+    create_all only creates missing tables, so indexes added to a model later
+    never reach a database created before. On PostgreSQL the indexes are built
+    with CREATE INDEX CONCURRENTLY, outside a transaction, and an invalid index
+    left behind by an interrupted build is dropped and built again. The
+    pg_trgm extension and its TRIGRAM_INDEXES are also set up there.
+
+    Returns:
+        list[str]: Names of the indexes created
+    """
+    created = []
+    inspector = inspect(engine)
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as connection:
+        invalid = set()
+        if engine.dialect.name == "postgresql":
+            invalid = set(connection.execute(text(
+                "SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid WHERE NOT i.indisvalid"
+            )).scalars())
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing and index.name not in invalid:
+                    continue
+                try:
+                    if index.name in invalid:
+                        connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index.name}"'))
+                    logger.info("Creating index %s on %s", index.name, table.name)
+                    connection.execute(text(_create_index_sql(index)))
+                    created.append(index.name)
+                except Exception:
+                    # Another worker may be building the same index; the next start retries
+                    logger.exception("Could not create index %s", index.name)
+        if engine.dialect.name == "postgresql" and inspector.has_table("student"):
+            existing = {index["name"] for index in inspector.get_indexes("student")}
+            for name, sql in TRIGRAM_INDEXES.items():
+                if name in existing and name not in invalid:
+                    continue
+                try:
+                    connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+                    if name in invalid:
+                        connection.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+                    logger.info("Creating index %s on student", name)
+                    connection.execute(text(sql))
+                    created.append(name)
+                except Exception:
+                    logger.exception("Could not create index %s", name)
+    return created
+
+def explain(statement) -> list[str]:
+    """
+    Get the query plan of a statement as text lines.
+
+    Args:
+        statement: SQLAlchemy SELECT statement
+
+    Parameters are inlined, so this is the plan for those values. A statement
+    psycopg has prepared may run with a generic plan instead, which cannot use a
+    partial index unless the indexed values are literals in the SQL too.
+
+    Returns:
+        list[str]: The plan from EXPLAIN (PostgreSQL) or EXPLAIN QUERY PLAN (SQLite)
+    """
+    sql = str(statement.compile(dialect=engine.dialect, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as connection:
+        if engine.dialect.name == "postgresql":
+            # Tables small enough to read in one go are always scanned; this
+            # checks that an index can be used, not that it is worth it yet.
+            connection.execute(text("SET LOCAL enable_seqscan = off"))
+            return list(connection.execute(text(f"EXPLAIN {sql}")).scalars())
+        return [row[-1] for row in connection.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+
+def uses_index(plan: list[str], index_name: str) -> bool:
+    """Whether a plan from explain() reads the given index."""
+    return any(index_name in line for line in plan)
+
+# The search lookups and the index each must use
+SEARCH_LOOKUPS = {
+    "search_students_by_class_section": (
+        select(Student).where(Student.class_name == "9", Student.section == "A"),
+        "ix_student_class_name_section"
+    ),
+    "search_students_by_status": (
+        select(Student).where(_status_filter(StudentStatus.SUSPENDED)),
+        "ix_student_current_status_not_active"
+    ),
+    "search_student_by_roll_no": (
+        select(Student).where(Student.roll_no == "1"),
+        "ix_student_roll_no"
+    ),
+}
+
+def search_lookups() -> dict:
+    """The lookups to check on the current database, with the index each must use."""
+    lookups = dict(SEARCH_LOOKUPS)
+    if engine.dialect.name == "postgresql":
+        # Elsewhere names are searched in process, without SQL
+        lookups["search_students_by_name"] = (
+            _trigram_name_search_statement("Ahmed", None, 10), "ix_student_name_trgm"
+        )
+    return lookups
+
+def check_search_indexes() -> dict[str, bool]:
+    """
+    Check that each search lookup's query plan uses its index.
+
+    Returns:
+        dict[str, bool]: Lookup name -> whether its plan uses the expected index
+    """
+    return {
+        name: uses_index(explain(statement), index_name)
+        for name, (statement, index_name) in search_lookups().items()
+    }
@@ -1,4 +1,5 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Column, Index, JSON, text
 from typing import Optional, List
 from enum import Enum
 from datetime import date, datetime
@@ -20,6 +21,25 @@ class StudentStatus(str, Enum):
     GRADUATED = "graduated"
     SUSPENDED = "suspended"
 
+_NOT_ACTIVE_STATUS_NAMES = ", ".join(f"'{status.name}'" for status in StudentStatus if status != StudentStatus.ACTIVE)
+
+class ImportMode(str, Enum):
+    """
+    Enumeration for bulk import modes.
+    """
+    INSERT = "insert"
+    UPSERT = "upsert"
+
+class ImportJobStatus(str, Enum):
+    """
+    Enumeration for background import job states.
+    """
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
 class UserRole(str, Enum):
     """
     Enumeration for user roles.
@@ -46,10 +66,36 @@ class User(SQLModel, table=True):
     student: Optional["Student"] = Relationship(back_populates="user")
     teacher: Optional["Teacher"] = Relationship(back_populates="user")
 
+class RefreshToken(SQLModel, table=True):
+    """
+    RefreshToken model storing hashed, revocable refresh tokens.
+    """
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    token_hash: str = Field(unique=True, index=True)
+    expires_at: datetime
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    revoked_at: Optional[datetime] = None
+    replaced_by_id: Optional[int] = None
+
 class Student(SQLModel, table=True):
     """
     Student model representing the students table.
     """
+    __table_args__ = (
+        # search_students_by_class_section
+        Index("ix_student_class_name_section", "class_name", "section"),
+        # search_students_by_status: most students are active, and listing them
+        # is a scan anyway, so PostgreSQL only indexes the other statuses (enums
+        # are stored by member name). SQLite cannot match "= 'SUSPENDED'" to an
+        # IN (...) predicate, so it indexes every row.
+        Index(
+            "ix_student_current_status_not_active",
+            "current_status",
+            postgresql_where=text(f"current_status IN ({_NOT_ACTIVE_STATUS_NAMES})")
+        ),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     roll_no: str = Field(unique=True, index=True)
     name: str
@@ -85,3 +131,56 @@ class Teacher(SQLModel, table=True):
     # Relationships
     user_id: Optional[int] = Field(foreign_key="user.id")
     user: Optional[User] = Relationship(back_populates="teacher")
+
+class ImportJob(SQLModel, table=True):
+    """
+    ImportJob model tracking a background student import.
+    """
+    id: str = Field(primary_key=True)
+    filename: str
+    mode: ImportMode = Field(default=ImportMode.INSERT)
+    status: ImportJobStatus = Field(default=ImportJobStatus.PENDING)
+    rows_processed: int = Field(default=0)
+    inserted: int = Field(default=0)
+    updated: int = Field(default=0)
+    unchanged: int = Field(default=0)
+    errors: List[dict] = Field(default_factory=list, sa_column=Column(JSON))
+    detail: Optional[str] = None
+    cancel_requested: bool = Field(default=False)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class ChatThread(SQLModel, table=True):
+    """
+    ChatThread model recording when each conversation thread was last used.
+    """
+    thread_id: str = Field(primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    last_active_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+class UserRead(SQLModel):
+    """
+    Public fields of a user returned by the API (everything but the password hash).
+    """
+    id: int
+    username: str
+    email: str
+    role: UserRole
+    is_active: bool
+    created_at: datetime
+    oauth_provider: Optional[str] = None
+
+class UserPage(SQLModel):
+    """
+    One page of users; pass ``next_after_id`` as ``after_id`` to get the next page.
+    """
+    items: List[UserRead]
+    next_after_id: Optional[int] = None
+
+class RowPage(SQLModel):
+    """
+    One page of column-projected rows; pass ``next_after_id`` as ``after_id`` to get the next page.
+    """
+    items: List[dict]
+    next_after_id: Optional[int] = None
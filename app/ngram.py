@@ -0,0 +1,79 @@
+import re
+import threading
+from collections import Counter, defaultdict
+
+def trigrams(text: str) -> set[str]:
+    """
+    Split text into the trigrams pg_trgm would use: each word is lowercased
+    and padded with two spaces in front and one behind.
+    """
+    grams = set()
+    for word in re.findall(r"\w+", text.casefold()):
+        padded = f"  {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+class NgramIndex:
+    """
+    In-process trigram index of short texts (e.g. student names) by ID.
+
+    Scores follow pg_trgm's word_similarity: the share of the query's trigrams
+    found in the text, so a partial or slightly misspelled name still ranks
+    the full name highly.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings: dict[str, set[int]] = defaultdict(set)
+        self._grams: dict[int, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._grams)
+
+    def add(self, item_id: int, text: str) -> None:
+        """Index a text, replacing any text indexed under the same ID."""
+        with self._lock:
+            self._remove(item_id)
+            grams = trigrams(text)
+            self._grams[item_id] = grams
+            for gram in grams:
+                self._postings[gram].add(item_id)
+
+    def remove(self, item_id: int) -> None:
+        """Drop an ID from the index."""
+        with self._lock:
+            self._remove(item_id)
+
+    def _remove(self, item_id: int) -> None:
+        for gram in self._grams.pop(item_id, ()):
+            postings = self._postings[gram]
+            postings.discard(item_id)
+            if not postings:
+                del self._postings[gram]
+
+    def search(self, query: str, k: int, threshold: float) -> list[tuple[int, float]]:
+        """
+        Find the texts most similar to a query.
+
+        Args:
+            query (str): Text to look for
+            k (int): Maximum number of matches
+            threshold (float): Minimum score, between 0 and 1
+
+        Returns:
+            list[tuple[int, float]]: ``(id, score)`` pairs, best first
+        """
+        query_grams = trigrams(query)
+        if not query_grams:
+            return []
+        with self._lock:
+            shared = Counter()
+            for gram in query_grams:
+                shared.update(self._postings.get(gram, ()))
+            scored = [
+                # Ties go to the text closest in length to the query
+                (count / len(query_grams), count / (len(self._grams[item_id]) + len(query_grams) - count), item_id)
+                for item_id, count in shared.items()
+            ]
+        matches = sorted((entry for entry in scored if entry[0] >= threshold), reverse=True)[:k]
+        return [(item_id, round(score, 4)) for score, _, item_id in matches]
@@ -0,0 +1,112 @@
+import re
+import statistics
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, List
+from app.async_crud import search_student_by_roll_no, search_students_by_class_section, search_students_by_status
+from app.models import Student, StudentStatus
+
+# Queries are only routed when they match a whole pattern, so anything longer
+# or phrased differently (e.g. "update the student with roll no 12") falls
+# through to the model.
+_LOOKUP = r"(?:please\s+)?(?:(?:show|get|find|fetch|list|display|give)\s+(?:me\s+)?)?(?:all\s+)?(?:the\s+)?"
+_END = r"\s*[?.!]*\s*$"
+_STATUSES = "|".join(status.value for status in StudentStatus)
+
+@dataclass
+class Intent:
+    """A query pattern answered by calling one CRUD function directly."""
+    tool: Callable[..., Awaitable]
+    pattern: re.Pattern
+
+    def match(self, query: str) -> dict | None:
+        """Return the tool arguments if the query matches, None otherwise."""
+        match = self.pattern.match(query)
+        return match.groupdict() if match else None
+
+intents = [
+    Intent(search_student_by_roll_no, re.compile(
+        rf"^\s*{_LOOKUP}(?:who\s+is\s+)?(?:the\s+)?student\s+(?:with\s+|having\s+)?"
+        rf"roll\s*(?:no\.?|number|#)\s*[:#]?\s*(?P<roll_no>[\w/-]+){_END}",
+        re.IGNORECASE
+    )),
+    Intent(search_students_by_class_section, re.compile(
+        rf"^\s*{_LOOKUP}students\s+(?:in|of|from)\s+class\s+(?P<class_name>[\w-]+)\s*,?\s*"
+        rf"(?:and\s+)?section\s+(?P<section>[\w-]+){_END}",
+        re.IGNORECASE
+    )),
+    Intent(search_students_by_status, re.compile(
+        rf"^\s*{_LOOKUP}(?P<status>{_STATUSES})\s+students{_END}",
+        re.IGNORECASE
+    )),
+]
+
+def match_intent(query: str, allowed_tools: set[str]) -> tuple[Callable[..., Awaitable], dict] | None:
+    """
+    Find a CRUD function that answers a query on its own.
+
+    Args:
+        query (str): The user's message
+        allowed_tools (set[str]): Names of the tools the user's role may call
+
+    Returns:
+        tuple[Callable, dict] | None: The async function and its arguments, or None
+            if the query has to go to the model
+    """
+    for intent in intents:
+        if intent.tool.__name__ not in allowed_tools:
+            continue
+        arguments = intent.match(query)
+        if arguments is not None:
+            if "status" in arguments:
+                arguments["status"] = StudentStatus(arguments["status"].lower())
+            return intent.tool, arguments
+    return None
+
+def _describe_student(student: Student) -> str:
+    return (
+        f"{student.name} (ID {student.id}, roll no {student.roll_no}, class {student.class_name}-{student.section}, "
+        f"{student.current_status.value if isinstance(student.current_status, StudentStatus) else student.current_status})"
+    )
+
+def format_answer(result: Student | List[Student] | None) -> str:
+    """Write the answer to a routed query."""
+    if result is None:
+        return "No student was found with that roll number."
+    if isinstance(result, Student):
+        return f"Found {_describe_student(result)}."
+    if not result:
+        return "No matching students were found."
+    lines = "\n".join(f"- {_describe_student(student)}" for student in result)
+    return f"Found {len(result)} student{'s' if len(result) != 1 else ''}:\n{lines}"
+
+class RouterMetrics:
+    """Counts of routed and model-handled queries, and recent routed latencies."""
+
+    def __init__(self, window: int = 1000):
+        self._lock = threading.Lock()
+        self.routed = 0
+        self.llm = 0
+        self._latencies = deque(maxlen=window)
+
+    def record_routed(self, seconds: float) -> None:
+        with self._lock:
+            self.routed += 1
+            self._latencies.append(seconds)
+
+    def record_llm(self) -> None:
+        with self._lock:
+            self.llm += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.routed + self.llm
+            return {
+                "routed": self.routed,
+                "llm": self.llm,
+                "routed_ratio": round(self.routed / total, 4) if total else 0.0,
+                "routed_p50_ms": round(statistics.median(self._latencies) * 1000, 2) if self._latencies else None,
+            }
+
+router_metrics = RouterMetrics()
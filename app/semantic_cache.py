@@ -0,0 +1,177 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List
+import faiss
+import numpy as np
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from app.embeddings import get_embeddings
+from app.events import on_change
+from app.models import UserRole
+from app.settings import (
+    SEMANTIC_CACHE_ENABLED, SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_TTL_SECONDS, SEMANTIC_CACHE_MAXSIZE
+)
+
+@dataclass
+class _Entry:
+    answer: str
+    expires_at: float
+    latency: float
+
+class _Partition:
+    """
+    Cached answers of one role: a FAISS inner-product index over normalized
+    query embeddings plus the entries in least-recently-used order.
+    """
+
+    def __init__(self, dimension: int):
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+        self.entries: OrderedDict[int, _Entry] = OrderedDict()
+
+    def remove(self, entry_id: int) -> None:
+        self.entries.pop(entry_id, None)
+        self.index.remove_ids(np.array([entry_id], dtype=np.int64))
+
+class SemanticCache:
+    """
+    Cache of chat answers looked up by query similarity, partitioned by user role.
+
+    A query hits when the cosine similarity between its embedding and a cached
+    query of the same role reaches the threshold. Entries expire after ``ttl``
+    seconds, each role keeps at most ``maxsize`` entries (least recently used
+    are evicted), and every student/teacher write clears the whole cache.
+    """
+
+    def __init__(self, threshold: float, ttl: float, maxsize: int):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._partitions: dict[UserRole, _Partition] = {}
+        self._lock = threading.Lock()
+        self._next_id = 0
+        # Bumped on every invalidation, so answers computed while a write
+        # happened are not stored afterwards.
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self.latency_saved = 0.0
+
+    async def embed(self, query: str) -> np.ndarray:
+        """Embed and L2-normalize a query."""
+        vector = np.array([await get_embeddings().aembed_query(query)], dtype=np.float32)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def lookup(self, role: UserRole, vector: np.ndarray) -> str | None:
+        """
+        Find a cached answer for a query embedding.
+
+        Args:
+            role (UserRole): Role of the user asking
+            vector (np.ndarray): Normalized query embedding from embed()
+
+        Returns:
+            str | None: The cached answer on a hit, None on a miss
+        """
+        start = time.perf_counter()
+        with self._lock:
+            partition = self._partitions.get(role)
+            if partition is not None and partition.entries:
+                scores, ids = partition.index.search(vector, 1)
+                entry_id = int(ids[0][0])
+                entry = partition.entries.get(entry_id)
+                if entry is not None and scores[0][0] >= self.threshold:
+                    if entry.expires_at > time.monotonic():
+                        partition.entries.move_to_end(entry_id)
+                        self.hits += 1
+                        self.latency_saved += max(entry.latency - (time.perf_counter() - start), 0.0)
+                        return entry.answer
+                    partition.remove(entry_id)
+            self.misses += 1
+            return None
+
+    def store(self, role: UserRole, vector: np.ndarray, answer: str, latency: float, generation: int) -> None:
+        """
+        Cache an answer.
+
+        Args:
+            role (UserRole): Role of the user who asked
+            vector (np.ndarray): Normalized query embedding from embed()
+            answer (str): The agent's answer
+            latency (float): Seconds the agent took, credited as saved on each hit
+            generation (int): Value of ``generation`` before the agent ran; the
+                answer is dropped if the cache was invalidated since
+        """
+        with self._lock:
+            if generation != self.generation or self.maxsize <= 0:
+                return
+            partition = self._partitions.get(role)
+            if partition is None:
+                partition = self._partitions[role] = _Partition(vector.shape[1])
+            entry_id = self._next_id
+            self._next_id += 1
+            partition.index.add_with_ids(vector, np.array([entry_id], dtype=np.int64))
+            partition.entries[entry_id] = _Entry(answer, time.monotonic() + self.ttl, latency)
+            while len(partition.entries) > self.maxsize:
+                partition.remove(next(iter(partition.entries)))
+                self.evictions += 1
+
+    def invalidate(self) -> None:
+        """Drop every cached answer."""
+        with self._lock:
+            self._partitions.clear()
+            self.generation += 1
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        """Return hit rate, latency saved and per-role sizes."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": True,
+                "entries": {role.value: len(partition.entries) for role, partition in self._partitions.items()},
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "latency_saved_seconds": round(self.latency_saved, 3),
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+def current_turn(messages: List[BaseMessage]) -> List[BaseMessage]:
+    """Return the messages produced since the last user message."""
+    for position in range(len(messages) - 1, -1, -1):
+        if isinstance(messages[position], HumanMessage):
+            return messages[position + 1:]
+    return messages
+
+def cacheable_answer(messages: List[BaseMessage], read_only_tools: set[str]) -> str | None:
+    """
+    Get the final answer of the latest turn if it is safe to cache.
+
+    A turn is cacheable only if it ends with a text answer and every tool it
+    called is read-only, so replaying the answer never skips a write.
+    """
+    turn = current_turn(messages)
+    if not turn or not isinstance(turn[-1], AIMessage) or turn[-1].tool_calls:
+        return None
+    for message in turn:
+        if isinstance(message, AIMessage) and any(call["name"] not in read_only_tools for call in message.tool_calls):
+            return None
+    answer = turn[-1].content
+    return answer if isinstance(answer, str) and answer else None
+
+semantic_cache = SemanticCache(
+    threshold=SEMANTIC_CACHE_THRESHOLD,
+    ttl=SEMANTIC_CACHE_TTL_SECONDS,
+    maxsize=SEMANTIC_CACHE_MAXSIZE
+) if SEMANTIC_CACHE_ENABLED else None
+
+if semantic_cache is not None:
+    @on_change
+    def _invalidate_semantic_cache(entity: str, action: str, ids: List[int]) -> None:
+        semantic_cache.invalidate()
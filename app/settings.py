@@ -9,3 +9,76 @@ SECRET_KEY = os.getenv("SECRET_KEY")
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 OAUTH_REDIRECT_URL = os.getenv("OAUTH_REDIRECT_URL", "http://localhost:8000/auth/callback")
+
+# Database connection pool (applies to the sync and the async engine separately)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+# Refresh tokens
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "14"))
+
+# Password hashing
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+
+# Authenticated user cache (per worker process)
+USER_CACHE_MAXSIZE = int(os.getenv("USER_CACHE_MAXSIZE", "1024"))
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+
+# Read-through cache of students looked up by ID or roll number
+STUDENT_CACHE_BACKEND = os.getenv("STUDENT_CACHE_BACKEND", "memory")  # "memory", "redis" or "local" (in-process Redis stand-in)
+STUDENT_CACHE_MAXSIZE = int(os.getenv("STUDENT_CACHE_MAXSIZE", "4096"))
+STUDENT_CACHE_TTL_SECONDS = float(os.getenv("STUDENT_CACHE_TTL_SECONDS", "300"))
+STUDENT_CACHE_REDIS_URL = os.getenv("STUDENT_CACHE_REDIS_URL", "redis://localhost:6379/0")
+
+# Bulk import
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+UPLOAD_SPOOL_CHUNK_BYTES = int(os.getenv("UPLOAD_SPOOL_CHUNK_BYTES", str(1024 * 1024)))
+IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "2"))
+IMPORT_JOB_STORE = os.getenv("IMPORT_JOB_STORE", "memory")  # "memory" or "database"
+IMPORT_JOB_RETENTION_SECONDS = float(os.getenv("IMPORT_JOB_RETENTION_SECONDS", "3600"))  # finished jobs kept in memory
+IMPORT_MAX_REPORTED_ERRORS = int(os.getenv("IMPORT_MAX_REPORTED_ERRORS", "1000"))
+
+# Embeddings
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "google")
+GOOGLE_EMBEDDING_MODEL = os.getenv("GOOGLE_EMBEDDING_MODEL", "models/text-embedding-004")
+LOCAL_EMBEDDING_MODEL = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+LOCAL_EMBEDDING_BATCH_SIZE = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "64"))
+
+# Semantic cache for /chat answers
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_TTL_SECONDS = float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "600"))
+SEMANTIC_CACHE_MAXSIZE = int(os.getenv("SEMANTIC_CACHE_MAXSIZE", "1000"))  # entries per role
+
+# Conversation checkpoints
+CHECKPOINTER_BACKEND = os.getenv("CHECKPOINTER_BACKEND", "memory")  # "memory", "sqlite" or "postgres"
+CHECKPOINTER_SQLITE_PATH = os.getenv("CHECKPOINTER_SQLITE_PATH", "checkpoints.sqlite")
+CHECKPOINTER_POSTGRES_URI = os.getenv("CHECKPOINTER_POSTGRES_URI", os.getenv("DATABASE_URI"))
+CHECKPOINT_MAX_PER_THREAD = int(os.getenv("CHECKPOINT_MAX_PER_THREAD", "20"))
+CHECKPOINT_THREAD_TTL_SECONDS = int(os.getenv("CHECKPOINT_THREAD_TTL_SECONDS", str(7 * 24 * 3600)))
+CHECKPOINT_PRUNE_INTERVAL_SECONDS = int(os.getenv("CHECKPOINT_PRUNE_INTERVAL_SECONDS", "600"))
+
+# Chat context (estimated tokens)
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "6000"))
+CONTEXT_RECENT_TOKEN_BUDGET = int(os.getenv("CONTEXT_RECENT_TOKEN_BUDGET", "3000"))
+TOOL_OUTPUT_TOKEN_LIMIT = int(os.getenv("TOOL_OUTPUT_TOKEN_LIMIT", "1000"))
+
+# Chat tools
+TOOL_CONCURRENCY = int(os.getenv("TOOL_CONCURRENCY", "4"))
+
+# Streaming (NDJSON) listings
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+# Fuzzy student name search (minimum word similarity, 0-1)
+NAME_SEARCH_THRESHOLD = float(os.getenv("NAME_SEARCH_THRESHOLD", "0.3"))
+
+# Semantic student/teacher lookup (on-disk FAISS indexes). Off by default: the
+# local embedding backend needs torch, which is not a declared dependency, and
+# each worker builds a missing index by embedding every record on startup.
+VECTOR_INDEX_ENABLED = os.getenv("VECTOR_INDEX_ENABLED", "false").lower() == "true"
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "vector_index")
+VECTOR_INDEX_EMBEDDING_BACKEND = os.getenv("VECTOR_INDEX_EMBEDDING_BACKEND", "local")
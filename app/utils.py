@@ -0,0 +1,50 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+from app.settings import BCRYPT_ROUNDS, PASSWORD_HASH_WORKERS
+
+# Password hashing. Hashes made with a different cost than BCRYPT_ROUNDS are
+# reported by needs_update, so they can be rehashed on the next successful login.
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+# bcrypt releases the GIL while hashing, so a small thread pool keeps the slow
+# hash off the event loop while bounding how many run at once.
+password_hash_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    """Verify password against hashed password."""
+    return pwd_context.verify(plain_password, hashed_password)
+
+def get_password_hash(password: str) -> str:
+    """Generate password hash."""
+    return pwd_context.hash(password)
+
+def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """
+    Verify a password and rehash it if the stored hash is outdated.
+
+    Returns:
+        tuple[bool, str | None]: Whether the password matched, and a new hash if
+            it matched and the stored hash needs an update (for example because
+            BCRYPT_ROUNDS changed), None otherwise
+    """
+    # OAuth users are stored without a password hash
+    if not hashed_password:
+        return False, None
+    if not pwd_context.verify(plain_password, hashed_password):
+        return False, None
+    if pwd_context.needs_update(hashed_password):
+        return True, pwd_context.hash(plain_password)
+    return True, None
+
+async def get_password_hash_async(password: str) -> str:
+    """Generate password hash on the password hashing pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_hash_pool, get_password_hash, password)
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> tuple[bool, str | None]:
+    """Run verify_and_update_password on the password hashing pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        password_hash_pool, verify_and_update_password, plain_password, hashed_password
+    )
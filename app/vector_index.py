@@ -0,0 +1,197 @@
+import logging
+import os
+import queue
+import tempfile
+import threading
+from collections import defaultdict
+from typing import Callable, List
+import faiss
+import numpy as np
+from sqlalchemy import select
+from sqlmodel import Session
+from app.database import engine
+from app.embeddings import get_embeddings
+from app.events import on_change
+from app.models import Student, Teacher
+from app.settings import VECTOR_INDEX_ENABLED, VECTOR_INDEX_DIR, VECTOR_INDEX_EMBEDDING_BACKEND, EXPORT_BATCH_SIZE
+
+logger = logging.getLogger(__name__)
+
+def describe_student(student: Student) -> str:
+    """Text embedded for a student."""
+    return (
+        f"{student.name}, {student.gender.value} student in class {student.class_name} section "
+        f"{student.section}, {student.current_status.value}, from {student.permanent_address}"
+    )
+
+def describe_teacher(teacher: Teacher) -> str:
+    """Text embedded for a teacher."""
+    return f"{teacher.name} teaches {teacher.subject} in the {teacher.department} department"
+
+def _embed(texts: List[str]) -> np.ndarray:
+    """Embed texts with the vector index model, L2-normalized for cosine similarity."""
+    vectors = np.array(get_embeddings(VECTOR_INDEX_EMBEDDING_BACKEND).embed_documents(texts), dtype=np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+class VectorIndex:
+    """
+    FAISS inner-product index of one table's records, keyed by primary key and
+    saved to disk.
+
+    A saved index is memory-mapped when loaded, so startup does not read it
+    into memory; FAISS copies it the first time it is modified.
+    """
+
+    def __init__(self, model, describe: Callable, path: str):
+        self.model = model
+        self.describe = describe
+        self.path = path
+        self.index: faiss.Index | None = None
+        self._lock = threading.Lock()
+
+    def load(self) -> bool:
+        """Memory-map the saved index. Returns False if there is none."""
+        if not os.path.exists(self.path):
+            return False
+        index = faiss.read_index(self.path, faiss.IO_FLAG_MMAP)
+        with self._lock:
+            self.index = index
+        return True
+
+    def build(self) -> None:
+        """Embed every record in batches and save the new index."""
+        index = None
+        with Session(engine) as session:
+            result = session.execute(select(self.model).execution_options(yield_per=EXPORT_BATCH_SIZE))
+            for records in result.scalars().partitions():
+                vectors = _embed([self.describe(record) for record in records])
+                if index is None:
+                    index = faiss.IndexIDMap2(faiss.IndexFlatIP(vectors.shape[1]))
+                index.add_with_ids(vectors, np.array([record.id for record in records], dtype=np.int64))
+        if index is None:
+            index = faiss.IndexIDMap2(faiss.IndexFlatIP(_embed(["dimension"]).shape[1]))
+        with self._lock:
+            self.index = index
+        self.save()
+
+    def apply(self, ids: List[int]) -> None:
+        """Re-embed the given records, dropping the ones that no longer exist."""
+        with Session(engine) as session:
+            records = session.execute(select(self.model).where(self.model.id.in_(ids))).scalars().all()
+        vectors = _embed([self.describe(record) for record in records]) if records else None
+        with self._lock:
+            self.index.remove_ids(np.array(ids, dtype=np.int64))
+            if records:
+                self.index.add_with_ids(vectors, np.array([record.id for record in records], dtype=np.int64))
+
+    def save(self) -> None:
+        """
+        Write the index to disk, replacing the saved one atomically.
+
+        Every worker process keeps its own copy up to date, so each writes to a
+        temporary file of its own.
+        """
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(self.path) or ".", suffix=".faiss.tmp")
+        os.close(descriptor)
+        try:
+            with self._lock:
+                faiss.write_index(self.index, temporary)
+            os.replace(temporary, self.path)
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+    def search(self, query: str, k: int) -> List[tuple[int, float]]:
+        """Return the ``(id, score)`` of the k records closest to a query, best first."""
+        vector = _embed([query])
+        with self._lock:
+            if self.index is None:
+                raise RuntimeError("The vector index is still being built; try again shortly")
+            scores, ids = self.index.search(vector, k)
+        return [(int(record_id), round(float(score), 4)) for score, record_id in zip(scores[0], ids[0]) if record_id != -1]
+
+class VectorIndexUpdater:
+    """
+    Keeps the vector indexes current from a background thread.
+
+    On start the saved indexes are loaded, or built if missing. Student and
+    teacher writes then queue their IDs; the thread re-embeds only those
+    records, in one batch per table for everything queued meanwhile, and
+    saves the index.
+    """
+
+    def __init__(self, indexes: dict[str, VectorIndex]):
+        self.indexes = indexes
+        self._queue: queue.Queue[tuple[str, List[int]]] = queue.Queue()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        """Start the background thread."""
+        os.makedirs(VECTOR_INDEX_DIR, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="vector-index", daemon=True)
+        self._thread.start()
+
+    def submit(self, entity: str, ids: List[int]) -> None:
+        """Queue changed records; ignored until the updater is started."""
+        if self._thread is not None:
+            self._queue.put((entity, ids))
+
+    def _run(self) -> None:
+        for entity, index in self.indexes.items():
+            try:
+                if not index.load():
+                    logger.info("Building the %s vector index", entity)
+                    index.build()
+            except Exception:
+                logger.exception("Could not load or build the %s vector index", entity)
+
+        while True:
+            pending = defaultdict(set)
+            entity, ids = self._queue.get()
+            pending[entity].update(ids)
+            while not self._queue.empty():
+                entity, ids = self._queue.get_nowait()
+                pending[entity].update(ids)
+            for entity, ids in pending.items():
+                index = self.indexes[entity]
+                if index.index is None:
+                    continue
+                try:
+                    index.apply(sorted(ids))
+                    index.save()
+                except Exception:
+                    logger.exception("Could not update the %s vector index", entity)
+
+vector_indexes = {
+    "student": VectorIndex(Student, describe_student, os.path.join(VECTOR_INDEX_DIR, "student.faiss")),
+    "teacher": VectorIndex(Teacher, describe_teacher, os.path.join(VECTOR_INDEX_DIR, "teacher.faiss")),
+}
+vector_index_updater = VectorIndexUpdater(vector_indexes)
+
+if VECTOR_INDEX_ENABLED:
+    @on_change
+    def _queue_vector_index_update(entity: str, action: str, ids: List[int]) -> None:
+        if entity in vector_indexes:
+            vector_index_updater.submit(entity, ids)
+
+def search_similar(entity: str, query: str, k: int) -> List[tuple[int, float]]:
+    """
+    Find the students or teachers whose description is closest to a query.
+
+    Args:
+        entity (str): 'student' or 'teacher'
+        query (str): Free-text description of what to look for
+        k (int): Maximum number of matches
+
+    Returns:
+        List[tuple[int, float]]: ``(id, cosine similarity)`` pairs, best first
+
+    Raises:
+        ValueError: If the entity is unknown or the vector index is disabled
+    """
+    if not VECTOR_INDEX_ENABLED:
+        raise ValueError("Semantic search is disabled (VECTOR_INDEX_ENABLED=false)")
+    if entity not in vector_indexes:
+        raise ValueError(f"Cannot search {entity!r}; choose from {', '.join(vector_indexes)}")
+    return vector_indexes[entity].search(query, k)
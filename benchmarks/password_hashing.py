@@ -0,0 +1,44 @@
+"""
+Benchmark login throughput (bcrypt verifications per second) against the size
+of the password hashing pool.
+
+Usage:
+    python -m benchmarks.password_hashing [--logins 64] [--rounds 12] [--pool-sizes 1 2 4 8]
+"""
+import argparse
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from passlib.context import CryptContext
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--logins", type=int, default=64, help="concurrent logins per run")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt cost factor")
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 2, 4, 8])
+    return parser.parse_args()
+
+async def run(context: CryptContext, hashed: str, logins: int, pool_size: int) -> float:
+    """Verify `logins` passwords concurrently on a pool of `pool_size` threads; return logins/s."""
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=pool_size) as pool:
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            loop.run_in_executor(pool, context.verify, "correct horse battery staple", hashed)
+            for _ in range(logins)
+        ))
+        return logins / (time.perf_counter() - start)
+
+def main() -> None:
+    args = parse_args()
+    context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=args.rounds)
+    hashed = context.hash("correct horse battery staple")
+    print(f"bcrypt rounds={args.rounds}, logins per run={args.logins}, cpus={os.cpu_count()}")
+    print(f"{'pool size':>10} {'logins/s':>10}")
+    for pool_size in args.pool_sizes:
+        rate = asyncio.run(run(context, hashed, args.logins, pool_size))
+        print(f"{pool_size:>10} {rate:>10.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+import os
+import tempfile
+
+# The engines are created when app.database is imported, so the test database
+# has to be configured first
+os.environ["DATABASE_URI"] = "sqlite:///" + os.path.join(tempfile.mkdtemp(), "test.db")
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ["VECTOR_INDEX_ENABLED"] = "false"
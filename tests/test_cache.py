@@ -0,0 +1,101 @@
+from datetime import date
+import pytest
+from sqlmodel import SQLModel
+from app import cache, crud
+from app.cache import LocalRedis, RedisCache, create_cache
+from app.database import engine
+from app.models import ImportMode
+
+IMPORT_HEADER = (
+    "roll_no,name,date_of_birth,class_name,section,gender,current_status,cnic_or_bform,contact_no,email,"
+    "father_guardian_name,father_guardian_contact,father_guardian_cnic,permanent_address,religion"
+)
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+@pytest.fixture(autouse=True)
+def tables():
+    SQLModel.metadata.create_all(engine)
+    yield
+    SQLModel.metadata.drop_all(engine)
+
+@pytest.fixture
+def student_cache(monkeypatch):
+    """A student cache on the LocalRedis stand-in, used by the CRUD functions."""
+    student_cache = crud._StudentCache(create_cache("local", 100, 300, "student:"))
+    monkeypatch.setattr(crud, "student_cache", student_cache)
+    return student_cache
+
+def add_student(roll_no: str, cnic: str):
+    return crud.add_student(
+        roll_no, f"Student {roll_no}", date(2005, 1, 1), "9", "A", "male", cnic, "0300", f"{roll_no}@example.com",
+        "Guardian", "0300", "35202", "Lahore", "Islam"
+    )
+
+def assert_not_cached(student_cache, student):
+    assert student_cache.backend.get(f"id:{student.id}") is None
+    assert student_cache.get_by_roll_no(student.roll_no) is None
+
+def test_hit_and_miss():
+    redis_cache = RedisCache(LocalRedis(10), ttl=60)
+    redis_cache.set("a", {"x": 1})
+    assert redis_cache.get("a") == {"x": 1}
+    assert redis_cache.get("b") is None
+    stats = redis_cache.stats()
+    assert (stats["hits"], stats["misses"], stats["hit_ratio"]) == (1, 1, 0.5)
+
+def test_eviction_and_expiry(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    redis_cache = RedisCache(LocalRedis(2), ttl=60)
+    for key in ("a", "b", "c"):
+        redis_cache.set(key, key)
+    assert redis_cache.get("a") is None
+    clock.now += 61
+    assert redis_cache.get("b") is None
+    stats = redis_cache.stats()
+    assert (stats["evictions"], stats["expirations"]) == (1, 1)
+
+def test_student_lookups_are_cached(student_cache):
+    student = add_student("1", "1001")
+    assert crud.get_student(student.id).roll_no == "1"
+    assert crud.search_student_by_roll_no("1").id == student.id
+    assert [row.id for row in crud.get_students_by_ids([student.id])] == [student.id]
+    stats = student_cache.stats()
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+
+def test_update_student_invalidates(student_cache):
+    student = add_student("1", "1001")
+    crud.get_student(student.id)
+    crud.update_student(student.id, name="Renamed")
+    assert_not_cached(student_cache, student)
+    assert crud.get_student(student.id).name == "Renamed"
+
+def test_delete_student_invalidates(student_cache):
+    student = add_student("1", "1001")
+    crud.get_student(student.id)
+    crud.delete_student(student.id)
+    assert_not_cached(student_cache, student)
+    assert crud.get_student(student.id) is None
+
+def test_bulk_import_invalidates(student_cache):
+    student = add_student("1", "1001")
+    crud.get_student(student.id)
+    row = "1,Renamed,2005-01-01,9,A,male,active,1001,0300,1@example.com,Guardian,0300,35202,Lahore,Islam"
+    result = crud.bulk_import_students(f"{IMPORT_HEADER}\n{row}".encode(), "csv", ImportMode.UPSERT)
+    assert result.updated == 1
+    assert_not_cached(student_cache, student)
+    assert crud.search_student_by_roll_no("1").name == "Renamed"
+
+def test_stale_read_is_not_stored(student_cache):
+    student = add_student("1", "1001")
+    generation = student_cache.generation
+    stale = crud.get_students_by_ids([student.id])[0]
+    student_cache.invalidate([student.id])
+    student_cache.put(stale, generation)
+    assert_not_cached(student_cache, student)
@@ -0,0 +1,24 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlmodel import SQLModel
+from app.database import engine
+from app.migrations import SEARCH_LOOKUPS, explain, uses_index
+
+@pytest.fixture(scope="module", autouse=True)
+def tables():
+    SQLModel.metadata.create_all(engine)
+    yield
+    SQLModel.metadata.drop_all(engine)
+
+@pytest.mark.parametrize("name", SEARCH_LOOKUPS)
+def test_search_lookup_uses_index(name):
+    statement, index_name = SEARCH_LOOKUPS[name]
+    assert uses_index(explain(statement), index_name)
+
+def test_status_lookup_is_not_a_parameter():
+    # explain() inlines every parameter; the status must also be inlined when the
+    # statement is sent, or a prepared statement's generic plan skips the partial index
+    statement, _ = SEARCH_LOOKUPS["search_students_by_status"]
+    compiled = statement.compile(dialect=postgresql.dialect(), compile_kwargs={"render_postcompile": True})
+    assert "current_status = 'SUSPENDED'" in str(compiled)
+    assert not compiled.params